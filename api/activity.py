@@ -0,0 +1,88 @@
+import os
+from datetime import timedelta
+from typing import Any, Dict, List
+
+import asyncpg
+
+import jobs
+import queries
+
+# Per-place engagement counted into hourly ('h') and daily ('d') buckets, so
+# trending reads sum a few dozen rows per place instead of scanning the
+# likes, favorites and comments tables.
+
+# Window name -> (granularity, date_trunc unit, span). A window covers the
+# current partial bucket plus every whole bucket inside the span.
+WINDOWS = {
+    "1h": ("h", "hour", timedelta(hours=1)),
+    "24h": ("h", "hour", timedelta(hours=24)),
+    "7d": ("d", "day", timedelta(days=7)),
+}
+
+GRANULARITIES = {
+    "hour": ("h", timedelta(hours=1)),
+    "day": ("d", timedelta(days=1)),
+}
+
+# How long buckets are kept, by granularity; must cover the longest window
+RETENTION = {
+    "h": timedelta(days=int(os.getenv("ACTIVITY_HOURLY_RETENTION_DAYS", "8"))),
+    "d": timedelta(days=int(os.getenv("ACTIVITY_DAILY_RETENTION_DAYS", "90"))),
+}
+
+# Seconds between prunes of expired buckets
+ACTIVITY_PRUNE_INTERVAL = float(os.getenv("ACTIVITY_PRUNE_INTERVAL", "3600"))
+
+ACTIVITY_PRUNE_LOCK = 0x75770003
+
+
+async def record(
+    conn: asyncpg.Connection,
+    place_id: int,
+    likes: int = 0,
+    dislikes: int = 0,
+    favorites: int = 0,
+    comments: int = 0
+):
+    """Count engagement events for a place in the current hour and day.
+
+    Call inside the mutation's transaction so the counts commit with it.
+    """
+    await queries.execute(conn, "activity.record", place_id, likes, dislikes, favorites, comments)
+
+
+async def get_hot_places(conn: asyncpg.Connection, window: str = "24h", limit: int = 10) -> List[Dict[str, Any]]:
+    """Places with the most engagement in `window` (one of WINDOWS).
+
+    The score is likes + 2 * favorites + comments - dislikes.
+    """
+    granularity, unit, span = WINDOWS[window]
+    rows = await queries.fetch(conn, "activity.hot", granularity, unit, span, limit)
+    return [dict(row) for row in rows]
+
+
+async def get_activity(
+    conn: asyncpg.Connection,
+    place_id: int,
+    granularity: str = "hour",
+    points: int = 24
+) -> List[Dict[str, Any]]:
+    """Engagement per bucket for a place, oldest first, ending with the
+    current bucket. Buckets without activity are zero-filled."""
+    code, width = GRANULARITIES[granularity]
+    rows = await queries.fetch(conn, "activity.series", place_id, code, granularity, points, width)
+    return [dict(row) for row in rows]
+
+
+def max_points(granularity: str) -> int:
+    """Most buckets of this granularity that retention still keeps."""
+    code, width = GRANULARITIES[granularity]
+    return RETENTION[code] // width
+
+
+async def prune(conn: asyncpg.Connection):
+    """Delete buckets older than their retention."""
+    await queries.execute(conn, "activity.prune", RETENTION["h"], RETENTION["d"])
+
+
+jobs.register("activity.prune", prune, ACTIVITY_PRUNE_INTERVAL, lock=ACTIVITY_PRUNE_LOCK)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict
+
+import metrics
+
+# Set ADMISSION_CONTROL=0 to let every request straight through
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL", "1").lower() not in ("0", "false", "no")
+
+# Requests allowed to run at once, per lane
+READ_CONCURRENCY = int(os.getenv("ADMISSION_READ_CONCURRENCY", "48"))
+PRIORITY_CONCURRENCY = int(os.getenv("ADMISSION_PRIORITY_CONCURRENCY", "16"))
+
+# Requests allowed to wait for a slot, per lane, and for how long (seconds)
+READ_QUEUE_SIZE = int(os.getenv("ADMISSION_READ_QUEUE", "96"))
+PRIORITY_QUEUE_SIZE = int(os.getenv("ADMISSION_PRIORITY_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+
+# Retry-After (seconds) sent with 503 responses
+RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Paths that are never queued or shed
+EXEMPT_PATHS = {"/metrics"}
+
+# Auth endpoints share the priority lane with writes so users can still log in
+PRIORITY_PATHS = {"/api/token", "/api/users/"}
+
+LANE_ACTIVE = metrics.Gauge("app_admission_active", "Requests currently running, per lane.", ("lane",))
+LANE_QUEUED = metrics.Gauge("app_admission_queued", "Requests waiting for a slot, per lane.", ("lane",))
+LANE_REJECTED = metrics.Counter("app_admission_rejected_total", "Requests shed with 503, per lane and reason.", ("lane", "reason"))
+LANE_WAIT = metrics.Histogram("app_admission_wait_seconds", "Time admitted requests spent queued, per lane.", ("lane",))
+
+
+class Lane:
+    """A concurrency limit with a bounded FIFO wait queue."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting up to the lane timeout. Returns False if shed."""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return True
+
+        if len(self._waiters) >= self.queue_size:
+            LANE_REJECTED.inc(lane=self.name, reason="queue_full")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            LANE_REJECTED.inc(lane=self.name, reason="timeout")
+            return False
+
+        LANE_WAIT.observe(time.perf_counter() - start, lane=self.name)
+        return True
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest live waiter."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter, so active stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+lanes: Dict[str, Lane] = {
+    "read": Lane("read", READ_CONCURRENCY, READ_QUEUE_SIZE, QUEUE_TIMEOUT),
+    "priority": Lane("priority", PRIORITY_CONCURRENCY, PRIORITY_QUEUE_SIZE, QUEUE_TIMEOUT),
+}
+
+
+def _collect_lane_metrics():
+    for lane in lanes.values():
+        LANE_ACTIVE.set(lane.active, lane=lane.name)
+        LANE_QUEUED.set(lane.queued, lane=lane.name)
+
+
+metrics.add_collector(_collect_lane_metrics)
+
+
+def lane_for(method: str, path: str) -> str:
+    """Writes and auth go through the priority lane, everything else is a read."""
+    if method not in ("GET", "HEAD") or path in PRIORITY_PATHS:
+        return "priority"
+    return "read"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that bounds in-flight requests and sheds load with 503."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        lane = lanes[lane_for(scope["method"], scope["path"])]
+        if not await lane.acquire():
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(RETRY_AFTER).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,14 @@
+"""Reproducible load tests and benchmarks for the API.
+
+Run from the ``api`` directory against a local Postgres (``DATABASE_URL``)::
+
+    python -m benchmarks.seed --users 2000 --places 5000 --reset
+    python -m benchmarks.load --concurrency 32 --requests 2000
+    python -m benchmarks.compare results/before.json results/after.json
+
+Row shaping and serialization micro-benchmarks need no database::
+
+    python -m benchmarks.shaping --rows 1000 10000
+
+The load driver needs ``httpx`` in addition to the API requirements.
+"""
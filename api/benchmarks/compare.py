@@ -0,0 +1,38 @@
+"""Compare two benchmarks.load result files scenario by scenario."""
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_per_request")
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict):
+    print(f"{before['revision']} -> {after['revision']}")
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        print(f"\n{name}")
+        for metric in METRICS:
+            print(f"  {metric:<20} {old[metric]:>10} -> {new[metric]:>10}  {_change(old[metric], new[metric])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    compare(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Drive the ASGI app in-process at a fixed concurrency and report latency.
+
+Each scenario runs its own warm-up and then a measured batch. The driver
+reports p50/p95/p99 latency, throughput and database queries per request.
+Query counts are read from the app's own /metrics counters. Results are
+written as JSON so two commits can be compared with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import asyncpg
+import httpx
+
+import database
+import main as api
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USER_PREFIX
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Logged-in users the authenticated scenarios rotate through
+TOKEN_POOL_SIZE = 20
+
+
+class Context:
+    """Shared state the scenarios draw from."""
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, place_ids, usernames, skew: float):
+        self.client = client
+        self.rng = rng
+        self.place_ids = place_ids
+        self.usernames = usernames
+        self.place_weights = list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, len(place_ids) + 1)))
+        self.tokens = []
+
+    def popular_place(self) -> int:
+        return self.rng.choices(self.place_ids, cum_weights=self.place_weights)[0]
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+
+async def list_places(ctx: Context):
+    return await ctx.client.get("/api/places/", params={"limit": 100})
+
+
+async def feed_new(ctx: Context):
+    return await ctx.client.get("/api/feed/new", params={"limit": 20})
+
+
+async def feed_top(ctx: Context):
+    return await ctx.client.get("/api/feed/top", params={"limit": 20})
+
+
+async def place_detail(ctx: Context):
+    return await ctx.client.get(f"/api/places/{ctx.popular_place()}")
+
+
+async def like(ctx: Context):
+    return await ctx.client.post(
+        f"/api/places/{ctx.popular_place()}/like",
+        json={"is_like": ctx.rng.random() < 0.85},
+        headers=ctx.auth_headers(),
+    )
+
+
+async def favorite(ctx: Context):
+    return await ctx.client.post(f"/api/places/{ctx.popular_place()}/favorite", headers=ctx.auth_headers())
+
+
+async def login(ctx: Context):
+    return await ctx.client.post(
+        "/api/token",
+        json={"username": ctx.rng.choice(ctx.usernames), "password": BENCH_PASSWORD},
+    )
+
+
+SCENARIOS = {
+    "places": list_places,
+    "feed_new": feed_new,
+    "feed_top": feed_top,
+    "detail": place_detail,
+    "like": like,
+    "favorite": favorite,
+    "login": login,
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def total_db_queries(client: httpx.AsyncClient) -> float:
+    """Sum app_db_queries_total over all routes from the /metrics endpoint."""
+    response = await client.get("/metrics")
+    return sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in response.text.splitlines()
+        if line.startswith("app_db_queries_total{")
+    )
+
+
+async def run_batch(ctx: Context, scenario, requests: int, concurrency: int):
+    """Issue `requests` calls with `concurrency` workers; return latencies and error count."""
+    remaining = itertools.count()
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            start = time.perf_counter()
+            try:
+                response = await scenario(ctx)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def run_scenario(ctx: Context, name: str, args):
+    scenario = SCENARIOS[name]
+    requests = args.login_requests if name == "login" else args.requests
+    await run_batch(ctx, scenario, min(args.warmup, requests), args.concurrency)
+
+    queries_before = await total_db_queries(ctx.client)
+    start = time.perf_counter()
+    latencies, errors = await run_batch(ctx, scenario, requests, args.concurrency)
+    elapsed = time.perf_counter() - start
+    queries = await total_db_queries(ctx.client) - queries_before
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "queries_per_request": round(queries / requests, 2) if requests else 0.0,
+    }
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout
+        return revision + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def load_fixtures(args):
+    conn = await asyncpg.connect(database.DATABASE_URL)
+    try:
+        place_ids = [row["id"] for row in await conn.fetch("SELECT id FROM places ORDER BY id")]
+        usernames = [
+            row["username"]
+            for row in await conn.fetch(
+                "SELECT username FROM users WHERE username LIKE $1 ORDER BY id LIMIT $2",
+                BENCH_USER_PREFIX + "%",
+                TOKEN_POOL_SIZE,
+            )
+        ]
+    finally:
+        await conn.close()
+
+    if not place_ids or not usernames:
+        raise SystemExit("No benchmark data found; run `python -m benchmarks.seed` first")
+
+    # Popularity in the driver is independent of the seeder's hidden ranking
+    random.Random(args.seed).shuffle(place_ids)
+    return place_ids, usernames
+
+
+async def run(args):
+    place_ids, usernames = await load_fixtures(args)
+    await api.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            ctx = Context(client, random.Random(args.seed), place_ids, usernames, args.skew)
+            for username in usernames:
+                response = await client.post("/api/token", json={"username": username, "password": BENCH_PASSWORD})
+                response.raise_for_status()
+                ctx.tokens.append(response.json()["access_token"])
+
+            results = {}
+            for name in args.scenarios:
+                results[name] = await run_scenario(ctx, name, args)
+                stats = results[name]
+                print(
+                    f"{name:<10} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                    f"p99 {stats['p99_ms']:>9.2f} ms  {stats['throughput_rps']:>9.1f} req/s  "
+                    f"{stats['queries_per_request']:>6.1f} q/req  {stats['errors']} errors"
+                )
+    finally:
+        await api.app.router.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "places": len(place_ids),
+        },
+        "scenarios": results,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['revision']}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="measured requests for the bcrypt-bound login scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for which places get requested")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<revision>.json)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Seed the DATABASE_URL database with realistic, skewed benchmark data using COPY.
+
+Place popularity follows a Zipf-like distribution, so a handful of places
+collect most of the likes, favorites and comments, like viral pins do.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+import activity
+import database
+from security import get_password_hash
+
+# Every seeded user logs in with this password
+BENCH_PASSWORD = "benchpass"
+BENCH_USER_PREFIX = "bench_user_"
+
+# Centre of the UWI Mona campus and the spread of generated pins (degrees)
+CAMPUS_LAT = 18.0055
+CAMPUS_LON = -76.7460
+CAMPUS_SPREAD = 0.01
+
+# Activity buckets for the seeded places. BACKFILL_DENORMALIZED only
+# rebuilds place_activity when it is empty, so seeding on top of existing
+# data would leave the new places without sparklines or "hot" scores.
+REBUILD_ACTIVITY = """
+    INSERT INTO place_activity (granularity, place_id, bucket, likes, dislikes, favorites, comments)
+    SELECT g.granularity, e.place_id, date_trunc(g.unit, e.created_at),
+           SUM(e.likes), SUM(e.dislikes), SUM(e.favorites), SUM(e.comments)
+    FROM (
+        SELECT place_id, created_at, is_like::int AS likes, (NOT is_like)::int AS dislikes, 0 AS favorites, 0 AS comments FROM likes
+        UNION ALL
+        SELECT place_id, created_at, 0, 0, 1, 0 FROM favorites
+        UNION ALL
+        SELECT place_id, created_at, 0, 0, 0, 1 FROM comments
+    ) e
+    CROSS JOIN (VALUES ('h', 'hour', $3::interval), ('d', 'day', $4::interval)) AS g(granularity, unit, retention)
+    WHERE e.place_id BETWEEN $1 AND $2
+      AND e.created_at >= CURRENT_TIMESTAMP - g.retention
+    GROUP BY 1, 2, 3
+    ON CONFLICT (granularity, place_id, bucket) DO UPDATE
+    SET likes = EXCLUDED.likes, dislikes = EXCLUDED.dislikes,
+        favorites = EXCLUDED.favorites, comments = EXCLUDED.comments
+"""
+
+WORDS = [
+    "lime", "food", "study", "court", "hall", "library", "canteen", "field",
+    "bench", "garden", "lab", "lounge", "stage", "market", "corner", "spot",
+]
+
+
+def _popularity_weights(count: int, skew: float):
+    """Cumulative Zipf weights, for random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def _sample_places(rng: random.Random, place_ids, weights, k: int):
+    """Pick k distinct places, biased towards popular ones."""
+    chosen = set()
+    k = min(k, len(place_ids))
+    while len(chosen) < k:
+        chosen.update(rng.choices(place_ids, cum_weights=weights, k=k - len(chosen)))
+    return chosen
+
+
+def generate(args):
+    """Build the rows for every table as lists of tuples."""
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    password_hash = get_password_hash(BENCH_PASSWORD)
+
+    def timestamp():
+        return now - timedelta(seconds=rng.randint(0, args.days * 86400))
+
+    users = [
+        (user_id, f"{BENCH_USER_PREFIX}{user_id}", f"{BENCH_USER_PREFIX}{user_id}@bench.uwi.lol", password_hash, False, timestamp())
+        for user_id in range(args.first_ids["users"], args.first_ids["users"] + args.users)
+    ]
+    user_ids = [user[0] for user in users]
+
+    places = []
+    place_categories = []
+    for place_id in range(args.first_ids["places"], args.first_ids["places"] + args.places):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        places.append((
+            place_id,
+            name,
+            f"{name} - " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))),
+            round(CAMPUS_LAT + rng.uniform(-CAMPUS_SPREAD, CAMPUS_SPREAD), 8),
+            round(CAMPUS_LON + rng.uniform(-CAMPUS_SPREAD, CAMPUS_SPREAD), 8),
+            rng.choice(user_ids),
+            timestamp(),
+        ))
+        for category_id in rng.sample(args.category_ids, k=rng.randint(1, min(2, len(args.category_ids)))):
+            place_categories.append((place_id, category_id))
+
+    # Shuffle so the popular places aren't simply the oldest ones
+    place_ids = [place[0] for place in places]
+    rng.shuffle(place_ids)
+    weights = _popularity_weights(len(place_ids), args.skew)
+
+    likes, favorites, comments = [], [], []
+    comment_id = args.first_ids["comments"]
+    for user_id in user_ids:
+        for place_id in _sample_places(rng, place_ids, weights, rng.randint(0, 2 * args.likes_per_user)):
+            likes.append((place_id, user_id, rng.random() < 0.85, timestamp()))
+        for place_id in _sample_places(rng, place_ids, weights, rng.randint(0, 2 * args.favorites_per_user)):
+            favorites.append((place_id, user_id, timestamp()))
+        for _ in range(rng.randint(0, 2 * args.comments_per_user)):
+            place_id = rng.choices(place_ids, cum_weights=weights)[0]
+            created_at = timestamp()
+            comments.append((
+                comment_id,
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))),
+                place_id,
+                user_id,
+                created_at,
+                created_at,
+            ))
+            comment_id += 1
+
+    return {
+        "users": (("id", "username", "email", "password_hash", "is_admin", "created_at"), users),
+        "places": (("id", "name", "description", "latitude", "longitude", "user_id", "created_at"), places),
+        "place_categories": (("place_id", "category_id"), place_categories),
+        "likes": (("place_id", "user_id", "is_like", "created_at"), likes),
+        "favorites": (("place_id", "user_id", "created_at"), favorites),
+        "comments": (("id", "content", "place_id", "user_id", "created_at", "updated_at"), comments),
+    }
+
+
+async def seed(args):
+    await database.initialize_db()
+    conn = await asyncpg.connect(database.DATABASE_URL)
+    try:
+        if args.reset:
+            await conn.execute(
+                """
+                TRUNCATE users, places, place_categories, comments, likes, favorites, change_log
+                RESTART IDENTITY CASCADE
+                """
+            )
+            # Recreate the default admin user
+            await database.initialize_db()
+
+        args.category_ids = [row["id"] for row in await conn.fetch("SELECT id FROM categories ORDER BY id")]
+        # Append after existing rows so seeding twice adds more data
+        args.first_ids = {
+            table: await conn.fetchval(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+            for table in ("users", "places", "comments")
+        }
+
+        tables = generate(args)
+        async with conn.transaction():
+            for table, (columns, records) in tables.items():
+                await conn.copy_records_to_table(table, records=records, columns=columns)
+                print(f"{table}: {len(records)} rows")
+
+            # Move sequences past the explicit ids we copied in
+            for table in ("users", "places", "comments"):
+                await conn.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                )
+
+            # COPY bypasses the DAO, so fill in the denormalized columns
+            await conn.execute(database.BACKFILL_DENORMALIZED)
+            await conn.execute(
+                REBUILD_ACTIVITY,
+                args.first_ids["places"],
+                args.first_ids["places"] + args.places - 1,
+                activity.RETENTION["h"],
+                activity.RETENTION["d"],
+            )
+
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+        await database.close_db_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--likes-per-user", type=int, default=20, help="mean likes per user")
+    parser.add_argument("--favorites-per-user", type=int, default=5, help="mean favorites per user")
+    parser.add_argument("--comments-per-user", type=int, default=3, help="mean comments per user")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for place popularity")
+    parser.add_argument("--days", type=int, default=90, help="spread timestamps over this many days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="truncate all data first")
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
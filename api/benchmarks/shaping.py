@@ -0,0 +1,191 @@
+"""Micro-benchmarks for the Python-side row shaping and serialization paths.
+
+Each case runs the real DAO shaping helpers over synthetic asyncpg-like
+records at 1k and 10k rows. It reports the best-of-N wall time and, from
+a separate tracemalloc pass, the bytes allocated and peak memory. No
+database is needed.
+
+    python -m benchmarks.shaping --rows 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import interactions
+import places
+import schemas
+import serializers
+
+
+class FakeRecord(Mapping):
+    """Stand-in for asyncpg.Record: positional values plus key lookup."""
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, keys, values):
+        self._keys = keys
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return self._values[self._keys[key]]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def keys(self):
+        return self._keys.keys()
+
+
+def make_records(columns, rows):
+    """Build FakeRecords sharing one key->index map, like a fetch() result."""
+    keys = {name: i for i, name in enumerate(columns)}
+    return [FakeRecord(keys, row) for row in rows]
+
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+PLACE_COLUMNS = (
+    "id", "name", "description", "latitude", "longitude", "user_id", "created_at",
+    "updated_at", "osm_id", "is_osm_imported", "user_username",
+)
+COMMENT_COLUMNS = (
+    "id", "content", "place_id", "user_id", "created_at", "updated_at", "user_username",
+)
+CATEGORY_PLACE_COLUMNS = (
+    "id", "name", "description", "latitude", "longitude", "category_id", "user_id", "created_at",
+    "updated_at", "category_name", "category_color", "category_icon",
+)
+CATEGORY_COLUMNS = ("id", "name", "color", "icon")
+
+
+def place_rows(count: int):
+    return make_records(PLACE_COLUMNS, [
+        (
+            i, f"Place {i}", "A good lime spot " * 4,
+            Decimal("18.00550000") + Decimal(i % 100) / 10000, Decimal("-76.74600000") - Decimal(i % 100) / 10000,
+            i % 500, NOW - timedelta(minutes=i), NOW, None, False, f"user{i % 500}",
+        )
+        for i in range(count)
+    ])
+
+
+def comment_rows(count: int):
+    return make_records(COMMENT_COLUMNS, [
+        (i, "Nice place " * 5, i % 50, i % 500, NOW - timedelta(minutes=i), NOW, f"user{i % 500}")
+        for i in range(count)
+    ])
+
+
+def category_place_rows(count: int):
+    return make_records(CATEGORY_PLACE_COLUMNS, [
+        (
+            i, f"Place {i}", "A good lime spot " * 4, Decimal("18.0055"), Decimal("-76.746"),
+            (i % 5) + 1 if i % 7 else None, i % 500, NOW, NOW, "Food", "#FF5733", "utensils",
+        )
+        for i in range(count)
+    ])
+
+
+CATEGORIES = make_records(CATEGORY_COLUMNS, [(1, "Food", "#FF5733", "utensils"), (3, "Hangout", "#3357FF", "users")])
+
+
+def shaped_places(count: int):
+    shaped = []
+    for place in place_rows(count):
+        place_dict = places.format_place(place, CATEGORIES)
+        place_dict.update(like_count=10, dislike_count=2, favorite_count=4)
+        shaped.append(place_dict)
+    return shaped
+
+
+PLACE_LIST = TypeAdapter(List[schemas.Place])
+
+
+# Each case: (name, setup(count) -> data, run(data))
+CASES = [
+    ("dict(record)", place_rows, lambda rows: [dict(row) for row in rows]),
+    ("places.format_place", place_rows, lambda rows: [places.format_place(row, CATEGORIES) for row in rows]),
+    ("interactions.format_comment", comment_rows, lambda rows: [interactions.format_comment(row) for row in rows]),
+    ("interactions.format_category_place", category_place_rows, lambda rows: [interactions.format_category_place(row) for row in rows]),
+    ("jsonable_encoder(places)", shaped_places, jsonable_encoder),
+    ("jsonable_encoder+json.dumps(places)", shaped_places, lambda data: json.dumps(jsonable_encoder(data)).encode()),
+    # What FastAPI does with a response_model, versus the compiled serializer
+    ("validate+dump_json(places)", shaped_places, lambda data: PLACE_LIST.dump_json(PLACE_LIST.validate_python(data))),
+    ("serializers.dump_json(places)", shaped_places, lambda data: serializers.dump_json(List[schemas.Place], data)),
+]
+
+
+def time_case(run, data, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_allocations(run, data):
+    """Return (bytes allocated and still referenced by the result, peak bytes)."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = run(data)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before, peak - before
+
+
+def run(args):
+    report = {}
+    for name, setup, case in CASES:
+        if args.only and not any(part in name for part in args.only):
+            continue
+        for count in args.rows:
+            data = setup(count)
+            best = time_case(case, data, args.repeat)
+            retained, peak = measure_allocations(case, data)
+            report[f"{name}@{count}"] = {
+                "rows": count,
+                "best_ms": round(best * 1000, 3),
+                "us_per_row": round(best * 1e6 / count, 3),
+                "retained_kb": round(retained / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+            }
+            stats = report[f"{name}@{count}"]
+            print(
+                f"{name:<38} {count:>6} rows  {stats['best_ms']:>9.2f} ms  "
+                f"{stats['us_per_row']:>7.2f} us/row  {stats['retained_kb']:>9.1f} KiB kept  {stats['peak_kb']:>9.1f} KiB peak"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case; the best is reported")
+    parser.add_argument("--only", nargs="+", help="run only cases whose name contains one of these")
+    parser.add_argument("--output", help="also write the results as JSON")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
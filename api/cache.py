@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import metrics
+
+
+class LRUCache:
+    """A bounded in-process cache that evicts the least recently used entry.
+
+    Entries also expire after `ttl` seconds, which bounds how long a value
+    read from a lagging replica can outlive the write that invalidated it.
+    Hits and misses are counted under `name` in the cache metrics.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Bumped by every invalidation; see token()
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value for key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        metrics.record_cache(self.name, entry is not None)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def token(self) -> int:
+        """Take before loading a value; pass to set() so a load that raced an
+        invalidation doesn't cache what it read before the write."""
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, token: Optional[int] = None):
+        if token is not None and token != self._generation:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything when key is None."""
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
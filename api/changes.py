@@ -0,0 +1,91 @@
+import os
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+import asyncpg
+
+import jobs
+import places as places_dao
+import queries
+
+# Change kinds: 'place' = created, updated or deleted; 'counts' = likes,
+# favorites or comment count changed
+PLACE = "place"
+COUNTS = "counts"
+
+# Most change log rows read per sync call; clients keep calling while has_more
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+
+# Tombstones older than this are dropped; clients offline longer resync fully
+SYNC_TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30")))
+
+# Seconds between change log compactions
+SYNC_COMPACTION_INTERVAL = float(os.getenv("SYNC_COMPACTION_INTERVAL", "3600"))
+
+# Advisory lock key
+COMPACTION_LOCK = 0x75770002
+
+async def record(conn: asyncpg.Connection, kind: str, place_id: int):
+    """Log a change to a place. Call inside the mutation's transaction."""
+    await queries.execute(conn, "changes.record", kind, place_id)
+
+
+async def get_changes_since(conn: asyncpg.Connection, since: Optional[int], limit: int = SYNC_PAGE_SIZE) -> Dict[str, Any]:
+    """Get what changed after change version `since`.
+
+    Returns the places created or updated (in the get_places shape), the ids
+    deleted, and the counters of places whose likes/favorites changed.
+    Only changes from transactions older than every one still running are
+    returned, so a slow writer's change is never skipped. ``version`` is the
+    value to pass as ``since`` next time. ``reset`` means `since` is missing
+    or older than the compaction horizon, so the client must refetch
+    everything and continue from ``version``.
+    """
+    bounds = await queries.fetchrow(conn, "changes.bounds")
+    if since is None or since < bounds["horizon"]:
+        return {
+            "version": bounds["current_version"],
+            "reset": True,
+            "has_more": False,
+            "places": [],
+            "deleted": [],
+            "counters": [],
+        }
+
+    rows = await queries.fetch(conn, "changes.since", since, limit)
+    version = max((row["version"] for row in rows), default=since)
+    place_ids = [row["place_id"] for row in rows if row["place_changed"]]
+    counter_ids = [row["place_id"] for row in rows if not row["place_changed"]]
+
+    places = await places_dao.get_places_by_ids(conn, place_ids)
+    counters = [dict(row) for row in await queries.fetch(conn, "changes.counters", counter_ids)] if counter_ids else []
+
+    # Anything that changed but no longer exists was deleted
+    present = {place["id"] for place in places} | {counter["id"] for counter in counters}
+    deleted = [place_id for place_id in place_ids + counter_ids if place_id not in present]
+
+    return {
+        "version": version,
+        "reset": False,
+        "has_more": sum(row["change_count"] for row in rows) >= limit,
+        "places": places,
+        "deleted": deleted,
+        "counters": counters,
+    }
+
+
+async def compact(conn: asyncpg.Connection) -> bool:
+    """Drop superseded changes and expired tombstones.
+
+    Returns False if another worker is already compacting.
+    """
+    async with conn.transaction():
+        if not await queries.fetchval(conn, "advisory.try_xact_lock", COMPACTION_LOCK):
+            return False
+        await queries.execute(conn, "changes.compact_superseded")
+        await queries.execute(conn, "changes.expire_tombstones", SYNC_TOMBSTONE_RETENTION)
+    return True
+
+
+# compact() takes its own lock, so the job needs no scheduler lock
+jobs.register("changes.compact", compact, SYNC_COMPACTION_INTERVAL)
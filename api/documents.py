@@ -0,0 +1,264 @@
+import asyncpg
+from typing import List, Optional, Tuple
+
+import interactions
+import places
+import queries
+import singleflight
+
+# DAO functions that build the finished response document in Postgres
+# (json_agg/json_build_object) and return it as JSON text. They mirror the
+# shapes produced by places.py and interactions.py, so the API can pass the
+# text straight through as the response body.
+
+
+def iso_timestamp(column: str) -> str:
+    """A timestamptz formatted the way the response serializers write it:
+    ISO 8601 in UTC with a Z, with microseconds only when non-zero."""
+    utc = f"({column} AT TIME ZONE 'UTC')"
+    return (
+        f"to_char({utc}, 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+        f" || CASE WHEN date_part('microseconds', {utc})::bigint % 1000000 = 0 THEN '' ELSE to_char({utc}, '.US') END"
+        f" || 'Z'"
+    )
+
+
+CATEGORIES_JSON = """
+    COALESCE((
+        SELECT json_agg(json_build_object('id', c.id, 'name', c.name, 'color', c.color, 'icon', c.icon) ORDER BY c.name)
+        FROM categories c
+        JOIN place_categories pc ON c.id = pc.category_id
+        WHERE pc.place_id = p.id
+    ), '[]'::json)"""
+
+LIKE_COUNT = "(SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE)"
+DISLIKE_COUNT = "(SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE)"
+FAVORITE_COUNT = "(SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id)"
+
+# Place fields shared by the list and feed endpoints
+PLACE_FIELDS = [
+    ("id", "p.id"),
+    ("name", "p.name"),
+    ("description", "p.description"),
+    ("latitude", "p.latitude::float8"),
+    ("longitude", "p.longitude::float8"),
+    ("user_id", "p.user_id"),
+    ("created_at", iso_timestamp("p.created_at")),
+    ("updated_at", iso_timestamp("p.updated_at")),
+    ("osm_id", "p.osm_id"),
+    ("is_osm_imported", "p.is_osm_imported"),
+    ("user_username", "u.username"),
+    ("comment_count", "p.comment_count"),
+    ("categories", CATEGORIES_JSON),
+    ("like_count", LIKE_COUNT),
+    ("dislike_count", DISLIKE_COUNT),
+    ("favorite_count", FAVORITE_COUNT),
+]
+
+# osm_tags goes out as the JSON text asyncpg returns to the Python path
+FEED_FIELDS = PLACE_FIELDS + [("osm_tags", "p.osm_tags::text")]
+
+FAVORITE_FIELDS = [
+    ("id", "p.id"),
+    ("name", "p.name"),
+    ("description", "p.description"),
+    ("latitude", "p.latitude::float8"),
+    ("longitude", "p.longitude::float8"),
+    ("category_id", "p.category_id"),
+    ("user_id", "p.user_id"),
+    ("created_at", iso_timestamp("p.created_at")),
+    ("updated_at", iso_timestamp("p.updated_at")),
+    ("comment_count", "p.comment_count"),
+    ("category", """
+    CASE WHEN c.id IS NULL THEN NULL
+         ELSE json_build_object('id', c.id, 'name', c.name, 'color', c.color, 'icon', c.icon)
+    END"""),
+    ("like_count", LIKE_COUNT),
+    ("dislike_count", DISLIKE_COUNT),
+    ("favorite_count", FAVORITE_COUNT),
+]
+
+COMMENT_FIELDS = [
+    ("id", "c.id"),
+    ("content", "c.content"),
+    ("place_id", "c.place_id"),
+    ("user_id", "c.user_id"),
+    ("created_at", iso_timestamp("c.created_at")),
+    ("updated_at", iso_timestamp("c.updated_at")),
+    ("user", "json_build_object('id', u.id, 'username', u.username)"),
+]
+
+
+def viewer_fields(param: int):
+    """viewer_like/viewer_favorited for the user id bound to $param."""
+    return [
+        ("viewer_like", f"(SELECT l.is_like FROM likes l WHERE l.place_id = p.id AND l.user_id = ${param})"),
+        ("viewer_favorited", f"EXISTS(SELECT 1 FROM favorites f WHERE f.place_id = p.id AND f.user_id = ${param})"),
+    ]
+
+
+def json_object(fields) -> str:
+    return "json_build_object(" + ", ".join(f"'{key}', {expression}" for key, expression in fields) + ")"
+
+
+def _places_query(fields, page_filter: str, order_by: str, page_select: str = "p.*", page_order_by: str = None) -> str:
+    return f"""
+    WITH page AS (
+        SELECT {page_select}
+        FROM places p
+        {page_filter}
+        ORDER BY {page_order_by or order_by}
+        LIMIT $1 OFFSET $2
+    )
+    SELECT COALESCE(json_agg({json_object(fields)} ORDER BY {order_by}), '[]'::json)
+    FROM page p
+    LEFT JOIN users u ON p.user_id = u.id
+    """
+
+
+# Category filters on the GIN-indexed category_ids array (see places.get_places)
+CATEGORY_FILTERS = {
+    "any": "WHERE p.category_ids && $3::int[]",
+    "all": "WHERE p.category_ids @> $3::int[]",
+}
+NEWEST_ORDER = "p.created_at DESC"
+TOP_ORDER = "p.like_count DESC, p.created_at DESC"
+TOP_PAGE_SELECT = f"p.*, {LIKE_COUNT} AS like_count"
+TOP_PAGE_ORDER = "like_count DESC, p.created_at DESC"
+
+# Fixed query variants: (category match or None, viewer?) -> registered query name
+PLACES_QUERIES = {
+    (None, False): queries.register("documents.places", _places_query(PLACE_FIELDS, "", NEWEST_ORDER)),
+    (None, True): queries.register("documents.places_viewer", _places_query(PLACE_FIELDS + viewer_fields(3), "", NEWEST_ORDER)),
+}
+for match, category_filter in CATEGORY_FILTERS.items():
+    PLACES_QUERIES[(match, False)] = queries.register(
+        f"documents.places_{match}_categories", _places_query(PLACE_FIELDS, category_filter, NEWEST_ORDER)
+    )
+    PLACES_QUERIES[(match, True)] = queries.register(
+        f"documents.places_{match}_categories_viewer",
+        _places_query(PLACE_FIELDS + viewer_fields(4), category_filter, NEWEST_ORDER),
+    )
+NEWEST_QUERIES = {
+    False: queries.register("documents.newest", _places_query(FEED_FIELDS, "", NEWEST_ORDER)),
+    True: queries.register("documents.newest_viewer", _places_query(FEED_FIELDS + viewer_fields(3), "", NEWEST_ORDER)),
+}
+# The page already carries like_count, so reuse it instead of counting twice
+TOP_QUERIES = {
+    viewer: queries.register(name, _places_query(
+        [(key, "p.like_count" if key == "like_count" else expression) for key, expression in fields],
+        "",
+        TOP_ORDER,
+        TOP_PAGE_SELECT,
+        TOP_PAGE_ORDER,
+    ))
+    for viewer, name, fields in (
+        (False, "documents.top", FEED_FIELDS),
+        (True, "documents.top_viewer", FEED_FIELDS + viewer_fields(3)),
+    )
+}
+
+FAVORITES_QUERY = queries.register("documents.favorites", f"""
+    SELECT COALESCE(json_agg({json_object(FAVORITE_FIELDS + viewer_fields(1))} ORDER BY f.created_at DESC), '[]'::json)
+    FROM places p
+    JOIN favorites f ON p.id = f.place_id
+    LEFT JOIN categories c ON p.category_id = c.id
+    WHERE f.user_id = $1
+    """)
+
+
+def _comments_query(keyset: bool) -> str:
+    condition = "c.place_id = $1 AND (c.created_at, c.id) < ($3, $4)" if keyset else "c.place_id = $1"
+    offset = "" if keyset else "OFFSET $3"
+    return f"""
+    WITH page AS (
+        SELECT c.*
+        FROM comments c
+        WHERE {condition}
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT $2 {offset}
+    )
+    SELECT COALESCE(json_agg({json_object(COMMENT_FIELDS)} ORDER BY c.created_at DESC, c.id DESC), '[]'::json) AS body,
+           COUNT(*) AS row_count,
+           (array_agg(c.created_at ORDER BY c.created_at, c.id))[1] AS last_created_at,
+           (array_agg(c.id ORDER BY c.created_at, c.id))[1] AS last_id
+    FROM page c
+    JOIN users u ON c.user_id = u.id
+    """
+
+
+COMMENTS_QUERIES = {
+    False: queries.register("documents.comments", _comments_query(False)),
+    True: queries.register("documents.comments_before", _comments_query(True)),
+}
+
+
+# Feed documents are the same for every anonymous caller, so concurrent
+# identical requests share one query
+feed_flights = singleflight.SingleFlight("feed_json")
+
+
+async def get_places_json(
+    conn: asyncpg.Connection,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    viewer_id: Optional[int] = None,
+    category_ids: Optional[List[int]] = None,
+    match_all: bool = False
+) -> str:
+    """Get a page of places (same shape as places.get_places) as JSON text."""
+    params = [limit, skip]
+    category_ids = places.category_filter(category_id, category_ids)
+    match = None
+    if category_ids:
+        match = "all" if match_all else "any"
+        params.append(category_ids)
+    if viewer_id is not None:
+        params.append(viewer_id)
+    query = PLACES_QUERIES[(match, viewer_id is not None)]
+    return await queries.fetchval(conn, query, *params)
+
+
+async def get_newest_places_json(conn: asyncpg.Connection, limit: int = 10, viewer_id: Optional[int] = None) -> str:
+    """Get the newest places (same shape as places.get_newest_places) as JSON text."""
+    params = [limit, 0] + ([viewer_id] if viewer_id is not None else [])
+    return await feed_flights.do(
+        ("new", limit, viewer_id), lambda: queries.fetchval(conn, NEWEST_QUERIES[viewer_id is not None], *params)
+    )
+
+
+async def get_top_places_json(conn: asyncpg.Connection, limit: int = 10, viewer_id: Optional[int] = None) -> str:
+    """Get the most liked places (same shape as places.get_top_places) as JSON text."""
+    params = [limit, 0] + ([viewer_id] if viewer_id is not None else [])
+    return await feed_flights.do(
+        ("top", limit, viewer_id), lambda: queries.fetchval(conn, TOP_QUERIES[viewer_id is not None], *params)
+    )
+
+
+async def get_user_favorites_json(conn: asyncpg.Connection, user_id: int) -> str:
+    """Get a user's favorites (same shape as interactions.get_user_favorites) as JSON text."""
+    return await queries.fetchval(conn, FAVORITES_QUERY, user_id)
+
+
+async def get_comments_for_place_json(
+    conn: asyncpg.Connection,
+    place_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    before: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
+    """Get a page of comments as JSON text, plus the cursor for the next page.
+
+    The cursor is None when this page came back short.
+    """
+    if before is not None:
+        cursor_created_at, cursor_id = interactions.decode_comment_cursor(before)
+        row = await queries.fetchrow(conn, COMMENTS_QUERIES[True], place_id, limit, cursor_created_at, cursor_id)
+    else:
+        row = await queries.fetchrow(conn, COMMENTS_QUERIES[False], place_id, limit, skip)
+
+    next_cursor = None
+    if row["row_count"] and row["row_count"] == limit:
+        next_cursor = interactions.encode_comment_cursor({"created_at": row["last_created_at"], "id": row["last_id"]})
+    return row["body"], next_cursor
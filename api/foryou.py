@@ -0,0 +1,122 @@
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+import cache
+import jobs
+import placestore
+import queries
+
+# Personalized feed. Each user's affinity (category shares, the centroid of
+# the places they engage with, and the places to leave out) is recomputed
+# in the background into user_affinity. A request reads that one row and
+# scores every place in the in-process place store with a few vectorized
+# passes, so its cost doesn't depend on how many users or interactions
+# there are. Without the store, Postgres scores the places against the row
+# in one scan with the same formula.
+
+# Score = CATEGORY * category share
+#       + PROXIMITY * exp(-distance / FOR_YOU_PROXIMITY_SCALE_M)
+#       + FRESHNESS * 0.5 ** (age / FOR_YOU_HALF_LIFE)
+FOR_YOU_WEIGHTS = {
+    "category": float(os.getenv("FOR_YOU_CATEGORY_WEIGHT", "1.0")),
+    "proximity": float(os.getenv("FOR_YOU_PROXIMITY_WEIGHT", "0.5")),
+    "freshness": float(os.getenv("FOR_YOU_FRESHNESS_WEIGHT", "0.5")),
+}
+FOR_YOU_PROXIMITY_SCALE_M = float(os.getenv("FOR_YOU_PROXIMITY_SCALE_M", "1000"))
+FOR_YOU_HALF_LIFE = float(os.getenv("FOR_YOU_HALF_LIFE_DAYS", "7")) * 86400
+
+# Seconds between affinity refreshes, and users recomputed per statement
+AFFINITY_REFRESH_INTERVAL = float(os.getenv("AFFINITY_REFRESH_INTERVAL", "60"))
+AFFINITY_BATCH_SIZE = int(os.getenv("AFFINITY_BATCH_SIZE", "500"))
+
+AFFINITY_LOCK = 0x75770004
+
+affinities = cache.LRUCache(
+    "affinity",
+    int(os.getenv("AFFINITY_CACHE_SIZE", "10000")),
+    float(os.getenv("AFFINITY_CACHE_TTL", str(AFFINITY_REFRESH_INTERVAL))),
+)
+
+
+async def mark_stale(conn: asyncpg.Connection, user_id: int):
+    """Queue a user's affinity for recomputation after they like,
+    favorite, create or delete something."""
+    await queries.execute(conn, "affinity.enqueue", user_id)
+
+
+async def refresh(conn: asyncpg.Connection):
+    """Recompute the affinity of every queued user, a batch per transaction."""
+    while True:
+        async with conn.transaction():
+            rows = await queries.fetch(conn, "affinity.dequeue", AFFINITY_BATCH_SIZE)
+            if rows:
+                await queries.execute(conn, "affinity.recompute", [row["user_id"] for row in rows])
+        if len(rows) < AFFINITY_BATCH_SIZE:
+            return
+
+
+async def get_affinity(conn: asyncpg.Connection, user_id: int) -> Optional[Dict[str, Any]]:
+    """A user's affinity row, or None before it is first computed."""
+    affinity = affinities.get(user_id)
+    if affinity is None:
+        token = affinities.token()
+        row = await queries.fetchrow(conn, "affinity.for_user", user_id)
+        if row is None:
+            return None
+        affinity = {
+            "weights": dict(zip(row["category_ids"], row["weights"])),
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "place_ids": row["place_ids"],
+        }
+        affinities.set(user_id, affinity, token)
+    return affinity
+
+
+def score(store: placestore.PlaceStore, affinity: Optional[Dict[str, Any]], now: float):
+    """The for-you score of every row in the store."""
+    np = placestore.np
+    age = np.maximum(now - store.created_at, 0.0)
+    scores = FOR_YOU_WEIGHTS["freshness"] * np.exp2(-age / FOR_YOU_HALF_LIFE)
+    if affinity is None:
+        return scores
+
+    if affinity["weights"]:
+        scores += FOR_YOU_WEIGHTS["category"] * store.category_scores(affinity["weights"])
+    if affinity["latitude"] is not None:
+        distance = store.distances(affinity["latitude"], affinity["longitude"])
+        scores += FOR_YOU_WEIGHTS["proximity"] * np.exp(-distance / FOR_YOU_PROXIMITY_SCALE_M)
+    if affinity["place_ids"]:
+        # Already liked, disliked, favorited or created
+        scores[np.isin(store.ids, affinity["place_ids"])] = -math.inf
+    return scores
+
+
+async def get_for_you(
+    conn: asyncpg.Connection,
+    store: Optional[placestore.PlaceStore],
+    user_id: int,
+    limit: int = 10
+) -> List[Dict[str, float]]:
+    """The user's `limit` best places as [{"id", "score"}], best first.
+
+    Scored over the place store when there is one, otherwise in Postgres.
+    """
+    if store is None:
+        rows = await queries.fetch(
+            conn, "affinity.ranked", user_id, limit,
+            FOR_YOU_WEIGHTS["category"], FOR_YOU_WEIGHTS["proximity"], FOR_YOU_PROXIMITY_SCALE_M,
+            FOR_YOU_WEIGHTS["freshness"], FOR_YOU_HALF_LIFE,
+        )
+        return [{"id": row["id"], "score": row["score"]} for row in rows]
+
+    scores = score(store, await get_affinity(conn, user_id), time.time())
+    rows = store.best(scores, limit)
+    return [{"id": int(store.ids[row]), "score": float(scores[row])} for row in rows]
+
+
+jobs.register("affinity.refresh", refresh, AFFINITY_REFRESH_INTERVAL, lock=AFFINITY_LOCK)
@@ -0,0 +1,133 @@
+import math
+import os
+from typing import Any, Dict, List, Tuple
+
+import asyncpg
+
+import cache
+import placestore
+import queries
+
+# Place density grids for the map's heatmap layer.
+#
+# Cells are aligned to a global grid whose cell size is a power-of-two
+# fraction of a degree, so nearby viewports at the same zoom snap to the
+# same grid and share cached results.
+
+WEIGHTS = ("count", "likes", "favorites", "engagement")
+
+MAX_RESOLUTION = 256
+
+# Smallest cell, about 0.85 m of latitude
+MIN_CELL_SIZE = 2.0 ** -17
+
+HEATMAP_CACHE_SIZE = int(os.getenv("HEATMAP_CACHE_SIZE", "256"))
+HEATMAP_CACHE_TTL = float(os.getenv("HEATMAP_CACHE_TTL", "300"))
+
+grids = cache.LRUCache("heatmap", HEATMAP_CACHE_SIZE, HEATMAP_CACHE_TTL)
+
+
+class Grid:
+    """A bbox snapped to the global grid for a requested resolution."""
+
+    def __init__(self, south: float, west: float, north: float, east: float, resolution: int):
+        span = max(north - south, east - west)
+        self.cell_size = max(MIN_CELL_SIZE, 2.0 ** math.ceil(math.log2(span / resolution)))
+        self.south = math.floor(south / self.cell_size) * self.cell_size
+        self.west = math.floor(west / self.cell_size) * self.cell_size
+        self.rows = max(1, math.ceil((north - self.south) / self.cell_size))
+        self.cols = max(1, math.ceil((east - self.west) / self.cell_size))
+
+    @property
+    def north(self) -> float:
+        return self.south + self.rows * self.cell_size
+
+    @property
+    def east(self) -> float:
+        return self.west + self.cols * self.cell_size
+
+    def key(self) -> Tuple:
+        return (self.south, self.west, self.cell_size, self.rows, self.cols)
+
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse "south,west,north,east". Raises ValueError if malformed."""
+    south, west, north, east = (float(part) for part in bbox.split(","))
+    if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+        raise ValueError("Invalid bbox")
+    return south, west, north, east
+
+
+def _from_store(store: "placestore.PlaceStore", grid: Grid, weight: str) -> List[Tuple[int, int, float]]:
+    np = placestore.np
+    weights = {
+        "count": None,
+        "likes": store.like_count,
+        "favorites": store.favorite_count,
+        "engagement": store.like_count + store.favorite_count,
+    }[weight]
+    histogram, _, _ = np.histogram2d(
+        store.lat,
+        store.lon,
+        bins=(grid.rows, grid.cols),
+        range=((grid.south, grid.north), (grid.west, grid.east)),
+        weights=weights,
+    )
+    rows, cols = np.nonzero(histogram)
+    return [(int(row), int(col), float(value)) for row, col, value in zip(rows, cols, histogram[rows, cols])]
+
+
+async def _from_db(conn: asyncpg.Connection, grid: Grid, weight: str) -> List[Tuple[int, int, float]]:
+    rows = await queries.fetch(conn, "heatmap.cells", grid.south, grid.west, grid.cell_size, grid.rows, grid.cols)
+    cells = []
+    for row in rows:
+        value = {
+            "count": row["count"],
+            "likes": row["likes"],
+            "favorites": row["favorites"],
+            "engagement": row["likes"] + row["favorites"],
+        }[weight]
+        if value:
+            cells.append((row["row"], row["col"], float(value)))
+    return cells
+
+
+async def get_heatmap(
+    conn: asyncpg.Connection,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    resolution: int = 64,
+    weight: str = "count"
+) -> Dict[str, Any]:
+    """Binned place density over a bbox as sparse (row, col, value) cells.
+
+    Row 0 is the southmost row and column 0 the westmost. Uses the in-process
+    place store when it is loaded, otherwise bins in Postgres.
+    """
+    grid = Grid(south, west, north, east, min(resolution, MAX_RESOLUTION))
+    store = placestore.store
+    if store is not None:
+        version = ("store", store.version)
+    else:
+        version = ("db", (await queries.fetchrow(conn, "changes.bounds"))["current_version"])
+
+    key = (grid.key(), weight, version)
+    result = grids.get(key)
+    if result is None:
+        cells = _from_store(store, grid, weight) if store is not None else await _from_db(conn, grid, weight)
+        result = {
+            "south": grid.south,
+            "west": grid.west,
+            "north": grid.north,
+            "east": grid.east,
+            "cell_size": grid.cell_size,
+            "rows": grid.rows,
+            "cols": grid.cols,
+            "weight": weight,
+            "max": max((cell[2] for cell in cells), default=0.0),
+            "cells": cells,
+        }
+        grids.set(key, result)
+    return result
@@ -1,5 +1,18 @@
 import asyncpg
-from typing import List, Dict, Any, Optional
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import activity
+import changes
+import foryou
+import similar
+import invalidation
+import queries
+
+# Characters of the newest comment shown in list responses
+COMMENT_SNIPPET_LENGTH = 140
 
 # Comment operations
 async def create_comment(
@@ -9,71 +22,91 @@ async def create_comment(
     user_id: int
 ) -> Dict[str, Any]:
     """Create a new comment."""
-    comment = await conn.fetchrow(
-        """
-        INSERT INTO comments (content, place_id, user_id)
-        VALUES ($1, $2, $3)
-        RETURNING id, content, place_id, user_id, created_at, updated_at
-        """,
-        content, place_id, user_id
-    )
+    async with conn.transaction():
+        comment = await queries.fetchrow(conn, "comments.create", content, place_id, user_id)
+        await queries.execute(conn, "places.increment_comment_count", place_id)
+        await activity.record(conn, place_id, comments=1)
+        await changes.record(conn, changes.COUNTS, place_id)
     
     comment_dict = dict(comment)
     
     # Get user info
-    user = await conn.fetchrow(
-        """
-        SELECT id, username, email
-        FROM users
-        WHERE id = $1
-        """,
-        user_id
-    )
+    user = await queries.fetchrow(conn, "users.brief", user_id)
     
     if user:
         comment_dict['user'] = dict(user)
     
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
     return comment_dict
 
 async def get_comments_for_place(
     conn: asyncpg.Connection,
     place_id: int,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    before: Optional[str] = None
 ) -> List[Dict[str, Any]]:
-    """Get comments for a place."""
-    comments = await conn.fetch(
-        """
-        SELECT c.id, c.content, c.place_id, c.user_id, c.created_at, c.updated_at,
-               u.username as user_username, u.email as user_email
-        FROM comments c
-        JOIN users u ON c.user_id = u.id
-        WHERE c.place_id = $1
-        ORDER BY c.created_at DESC
-        LIMIT $2 OFFSET $3
-        """,
-        place_id, limit, skip
-    )
-    
-    result = []
-    for comment in comments:
-        comment_dict = dict(comment)
-        
-        # Format user info
-        comment_dict['user'] = {
-            'id': comment_dict['user_id'],
-            'username': comment_dict['user_username'],
-            'email': comment_dict['user_email']
-        }
-        
-        # Clean up redundant keys
-        for key in ['user_username', 'user_email']:
-            if key in comment_dict:
-                del comment_dict[key]
-        
-        result.append(comment_dict)
+    """Get comments for a place, newest first.
+
+    Pass the cursor of the last comment seen as ``before`` to page with a
+    keyset range scan instead of OFFSET.
+    """
+    if before is not None:
+        cursor_created_at, cursor_id = decode_comment_cursor(before)
+        comments = await queries.fetch(conn, "comments.for_place_before", place_id, cursor_created_at, cursor_id, limit)
+    else:
+        comments = await queries.fetch(conn, "comments.for_place", place_id, limit, skip)
+    
+    return [format_comment(comment) for comment in comments]
+
+def format_comment(comment: asyncpg.Record) -> Dict[str, Any]:
+    """Shape a comment row joined with users into a comment with a nested user."""
+    comment_dict = dict(comment)
+    
+    # Format user info
+    comment_dict['user'] = {
+        'id': comment_dict['user_id'],
+        'username': comment_dict['user_username']
+    }
+    
+    # Clean up redundant keys
+    del comment_dict['user_username']
+    
+    return comment_dict
+
+async def attach_last_comments(
+    conn: asyncpg.Connection,
+    places: List[Dict[str, Any]],
+    length: int = COMMENT_SNIPPET_LENGTH
+) -> List[Dict[str, Any]]:
+    """Add last_comment (a snippet of the newest comment, or None) to each place dict in one query."""
+    if not places:
+        return places
+    
+    rows = await queries.fetch(conn, "comments.latest_for_places", [place['id'] for place in places], length)
+    latest = {}
+    for row in rows:
+        comment = format_comment(row)
+        latest[comment.pop('place_id')] = comment
     
-    return result
+    for place in places:
+        place['last_comment'] = latest.get(place['id'])
+    
+    return places
+
+def encode_comment_cursor(comment: Dict[str, Any]) -> str:
+    """Build an opaque pagination cursor pointing just past a comment."""
+    raw = f"{comment['created_at'].isoformat()}|{comment['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_comment_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from encode_comment_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, comment_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid comment cursor")
 
 # Like operations
 async def create_or_update_like(
@@ -83,38 +116,26 @@ async def create_or_update_like(
     is_like: bool
 ) -> Dict[str, Any]:
     """Create or update a like/dislike."""
-    # Check if user already liked/disliked this place
-    existing_like = await conn.fetchrow(
-        """
-        SELECT id, place_id, user_id, is_like, created_at
-        FROM likes
-        WHERE place_id = $1 AND user_id = $2
-        """,
-        place_id, user_id
-    )
-    
-    if existing_like:
-        # Update existing like/dislike
-        like = await conn.fetchrow(
-            """
-            UPDATE likes
-            SET is_like = $1
-            WHERE id = $2
-            RETURNING id, place_id, user_id, is_like, created_at
-            """,
-            is_like, existing_like['id']
-        )
-    else:
-        # Create new like/dislike
-        like = await conn.fetchrow(
-            """
-            INSERT INTO likes (place_id, user_id, is_like)
-            VALUES ($1, $2, $3)
-            RETURNING id, place_id, user_id, is_like, created_at
-            """,
-            place_id, user_id, is_like
-        )
+    async with conn.transaction():
+        # Check if user already liked/disliked this place
+        existing_like = await queries.fetchrow(conn, "likes.for_user", place_id, user_id)
+        
+        if existing_like:
+            # Update existing like/dislike
+            like = await queries.fetchrow(conn, "likes.update", is_like, existing_like['id'])
+        else:
+            # Create new like/dislike
+            like = await queries.fetchrow(conn, "likes.create", place_id, user_id, is_like)
+        
+        # Only a new vote or a flipped one counts as activity
+        if not existing_like or existing_like['is_like'] != is_like:
+            await activity.record(conn, place_id, likes=int(is_like), dislikes=int(not is_like))
+            await foryou.mark_stale(conn, user_id)
+            await similar.mark_stale(conn, place_id)
+        
+        await changes.record(conn, changes.COUNTS, place_id)
     
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
     return dict(like)
 
 # Favorite operations
@@ -124,112 +145,88 @@ async def toggle_favorite(
     user_id: int
 ) -> Optional[Dict[str, Any]]:
     """Toggle a favorite for a place."""
-    # Check if user already favorited this place
-    existing_favorite = await conn.fetchrow(
-        """
-        SELECT id
-        FROM favorites
-        WHERE place_id = $1 AND user_id = $2
-        """,
-        place_id, user_id
-    )
-    
-    if existing_favorite:
-        # Remove favorite
-        await conn.execute(
-            """
-            DELETE FROM favorites
-            WHERE id = $1
-            """,
-            existing_favorite['id']
-        )
-        return None
-    else:
-        # Add favorite
-        favorite = await conn.fetchrow(
-            """
-            INSERT INTO favorites (place_id, user_id)
-            VALUES ($1, $2)
-            RETURNING id, place_id, user_id, created_at
-            """,
-            place_id, user_id
-        )
-        return dict(favorite)
+    async with conn.transaction():
+        # Check if user already favorited this place
+        existing_favorite = await queries.fetchrow(conn, "favorites.for_user", place_id, user_id)
+        
+        if existing_favorite:
+            # Remove favorite
+            await queries.execute(conn, "favorites.delete", existing_favorite['id'])
+            favorite = None
+        else:
+            # Add favorite
+            favorite = dict(await queries.fetchrow(conn, "favorites.create", place_id, user_id))
+            await activity.record(conn, place_id, favorites=1)
+        
+        await foryou.mark_stale(conn, user_id)
+        await similar.mark_stale(conn, place_id)
+        await changes.record(conn, changes.COUNTS, place_id)
+    
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
+    return favorite
 
 async def get_user_favorites(
     conn: asyncpg.Connection,
     user_id: int
 ) -> List[Dict[str, Any]]:
     """Get a user's favorited places."""
-    places = await conn.fetch(
-        """
-        SELECT p.id, p.name, p.description, p.latitude, p.longitude, 
-               p.category_id, p.user_id, p.created_at, p.updated_at,
-               c.id as category_id, c.name as category_name, 
-               c.color as category_color, c.icon as category_icon
-        FROM places p
-        JOIN favorites f ON p.id = f.place_id
-        LEFT JOIN categories c ON p.category_id = c.id
-        WHERE f.user_id = $1
-        ORDER BY f.created_at DESC
-        """,
-        user_id
-    )
-    
-    result = []
+    places = await queries.fetch(conn, "favorites.places", user_id)
+    return [format_category_place(place) for place in places]
+
+def format_category_place(place: asyncpg.Record) -> Dict[str, Any]:
+    """Shape a place row joined with its legacy category into a nested category."""
+    place_dict = dict(place)
+    
+    # Add category as nested object
+    if place_dict.get('category_id'):
+        place_dict['category'] = {
+            'id': place_dict['category_id'],
+            'name': place_dict['category_name'],
+            'color': place_dict['category_color'],
+            'icon': place_dict['category_icon']
+        }
+    else:
+        place_dict['category'] = None
+    
+    # Clean up redundant keys
+    for key in ['category_name', 'category_color', 'category_icon']:
+        if key in place_dict:
+            del place_dict[key]
+    
+    return place_dict
+
+# Viewer state operations
+async def get_viewer_state(
+    conn: asyncpg.Connection,
+    user_id: int,
+    place_ids: List[int]
+) -> Dict[int, Dict[str, Any]]:
+    """Get a user's like/favorite state for a batch of places."""
+    if not place_ids:
+        return {}
+    
+    rows = await queries.fetch(conn, "viewer.state", user_id, list(place_ids))
+    
+    return {
+        row['place_id']: {
+            'viewer_like': row['viewer_like'],
+            'viewer_favorited': row['viewer_favorited']
+        }
+        for row in rows
+    }
+
+async def attach_viewer_state(
+    conn: asyncpg.Connection,
+    user_id: int,
+    places: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Add viewer_like/viewer_favorited to each place dict in one query."""
+    state = await get_viewer_state(conn, user_id, [place['id'] for place in places])
+    
     for place in places:
-        place_dict = dict(place)
-        
-        # Add category as nested object
-        if place_dict.get('category_id'):
-            place_dict['category'] = {
-                'id': place_dict['category_id'],
-                'name': place_dict['category_name'],
-                'color': place_dict['category_color'],
-                'icon': place_dict['category_icon']
-            }
-        else:
-            place_dict['category'] = None
-        
-        # Clean up redundant keys
-        for key in ['category_name', 'category_color', 'category_icon']:
-            if key in place_dict:
-                del place_dict[key]
-        
-        # Get counts
-        place_id = place_dict['id']
-        
-        # Get likes count
-        likes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = TRUE
-            """,
-            place_id
-        )
-        
-        # Get dislikes count
-        dislikes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = FALSE
-            """,
-            place_id
-        )
-        
-        # Get favorites count
-        favorites_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM favorites 
-            WHERE place_id = $1
-            """,
-            place_id
-        )
-        
-        place_dict['like_count'] = likes_count
-        place_dict['dislike_count'] = dislikes_count
-        place_dict['favorite_count'] = favorites_count
-        
-        result.append(place_dict)
+        place_state = state.get(place['id'], {})
+        # viewer_like is True (liked), False (disliked) or None (no vote)
+        place['viewer_like'] = place_state.get('viewer_like')
+        place['viewer_favorited'] = place_state.get('viewer_favorited', False)
     
-    return result
\ No newline at end of file
+    return places
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncpg
+
+import database
+import queries
+
+# Postgres NOTIFY channel shared by every worker process
+CHANNEL = "uwi_cache_invalidation"
+
+# Topics; the key is the id of the changed row
+PLACE = "place"
+
+# Key is the hashed client key of a request that is writing (see
+# database.get_db), so every worker sends its reads to the primary
+WRITER = "writer"
+
+# Identifies this process so it can skip its own notifications
+WORKER_ID = uuid.uuid4().hex
+
+# Sent on the publisher's own connection, so it joins any open transaction
+NOTIFY = queries.register("invalidation.notify", "SELECT pg_notify($1, $2)")
+
+# Seconds between checks of (and reconnects to) the listener connection
+LISTENER_CHECK_INTERVAL = 5.0
+
+# Topic -> handlers called with the invalidated key (None means "everything")
+_handlers: Dict[str, List[Callable[[Optional[Any]], None]]] = defaultdict(list)
+
+_listener_task = None
+
+
+def subscribe(topic: str, handler: Callable[[Optional[Any]], None]):
+    """Call handler(key) whenever any worker invalidates `key` under `topic`.
+
+    Handlers are also called with None after the listener reconnects, since
+    notifications sent while it was down are lost.
+    """
+    _handlers[topic].append(handler)
+
+
+def _dispatch(topic: str, key: Optional[Any]):
+    for handler in _handlers.get(topic, ()):
+        handler(key)
+
+
+async def publish(conn: asyncpg.Connection, topic: str, key: Optional[Any] = None):
+    """Invalidate `key` under `topic` in this process and every other worker.
+
+    The NOTIFY is sent on `conn`, so inside a transaction it is only
+    delivered if the transaction commits.
+    """
+    _dispatch(topic, key)
+    payload = json.dumps({"origin": WORKER_ID, "topic": topic, "key": key})
+    await queries.execute(conn, NOTIFY, CHANNEL, payload)
+
+
+def _on_notification(connection, pid, channel, payload):
+    message = json.loads(payload)
+    if message["origin"] != WORKER_ID:
+        _dispatch(message["topic"], message["key"])
+
+
+def _flush_all():
+    for topic in list(_handlers):
+        _dispatch(topic, None)
+
+
+async def _listen():
+    connection = None
+    while True:
+        try:
+            if connection is None or connection.is_closed():
+                connection = await asyncpg.connect(database.DATABASE_URL)
+                await connection.add_listener(CHANNEL, _on_notification)
+                # Anything published while we weren't listening is unknown
+                _flush_all()
+            await asyncio.sleep(LISTENER_CHECK_INTERVAL)
+        except asyncio.CancelledError:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+            raise
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            connection = None
+            await asyncio.sleep(LISTENER_CHECK_INTERVAL)
+
+
+async def start():
+    """Start listening for invalidations from other workers."""
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.create_task(_listen())
+
+
+async def stop():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
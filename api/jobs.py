@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+import database
+import metrics
+import queries
+
+# Background work that shouldn't run on the request path. Modules register
+# their jobs at import; main starts the scheduler after the pools are up.
+
+# Most jobs running at once in this worker
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+JOB_RUNS = metrics.Counter(
+    "app_job_runs_total",
+    "Background job runs by job and result (ok, error, or skipped when another worker held the lock).",
+    ("job", "result"),
+)
+JOB_DURATION = metrics.Histogram(
+    "app_job_duration_seconds", "Background job run time.", ("job",), JOB_DURATION_BUCKETS
+)
+
+logger = logging.getLogger("uwi.jobs")
+
+
+class Job:
+    """A unit of background work, run with a primary connection.
+
+    Runs every `interval` seconds, or only when triggered if interval is
+    None. With a `lock` key, a run first takes that Postgres advisory lock
+    and is skipped if another worker holds it, so the job runs on one
+    worker at a time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[asyncpg.Connection], Awaitable[None]],
+        interval: Optional[float] = None,
+        lock: Optional[int] = None,
+        run_at_start: bool = False
+    ):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.lock = lock
+        self.run_at_start = run_at_start
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task = None
+
+
+_jobs: Dict[str, Job] = {}
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def register(
+    name: str,
+    run: Callable[[asyncpg.Connection], Awaitable[None]],
+    interval: Optional[float] = None,
+    lock: Optional[int] = None,
+    run_at_start: bool = False
+) -> Job:
+    """Add a job; it starts with the scheduler."""
+    job = _jobs[name] = Job(name, run, interval, lock, run_at_start)
+    return job
+
+
+def trigger(name: str):
+    """Run a job as soon as a slot is free. Triggers that arrive while the
+    job is waiting or running collapse into one extra run."""
+    job = _jobs[name]
+    if job._wakeup is not None:
+        job._wakeup.set()
+
+
+async def _run(job: Job):
+    async with _slots:
+        started = time.perf_counter()
+        result = "ok"
+        try:
+            primary = await database.get_primary_pool()
+            async with primary.acquire() as conn:
+                if job.lock is not None and not await queries.fetchval(conn, "advisory.try_lock", job.lock):
+                    result = "skipped"
+                    return
+                try:
+                    await job.run(conn)
+                finally:
+                    if job.lock is not None:
+                        await queries.fetchval(conn, "advisory.unlock", job.lock)
+        except Exception:
+            result = "error"
+            logger.exception("Job %s failed", job.name)
+        finally:
+            JOB_RUNS.inc(job=job.name, result=result)
+            if result != "skipped":
+                JOB_DURATION.observe(time.perf_counter() - started, job=job.name)
+
+
+async def _wait(job: Job):
+    try:
+        await asyncio.wait_for(job._wakeup.wait(), job.interval)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _schedule(job: Job):
+    if not job.run_at_start:
+        await _wait(job)
+    while True:
+        # Cleared before the run so a trigger during it causes another
+        job._wakeup.clear()
+        await _run(job)
+        await _wait(job)
+
+
+async def start():
+    """Start every registered job."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(JOB_CONCURRENCY)
+    for job in _jobs.values():
+        if job._task is None:
+            job._wakeup = asyncio.Event()
+            job._task = asyncio.create_task(_schedule(job))
+
+
+async def stop():
+    for job in _jobs.values():
+        if job._task is not None:
+            job._task.cancel()
+            try:
+                await job._task
+            except asyncio.CancelledError:
+                pass
+            job._task = None
+            job._wakeup = None
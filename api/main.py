@@ -1,21 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from fastapi.responses import PlainTextResponse
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta
 import asyncpg
 import uvicorn
+import os
 
 import schemas
-from database import get_db, initialize_db, close_db_connection
-from security import verify_password, create_access_token, get_current_user
+import metrics
+import admission
+import querylog
+import database
+import invalidation
+import changes as changes_dao
+import snapshot
+import placestore
+import heatmap
+import foryou
+import similar
+import activity
+import jobs
+import serializers
+from database import get_db, get_read_db, initialize_db, start_replicas, close_db_connection
+from security import verify_password, create_access_token, get_current_user, get_current_user_optional
 
 import users as users_dao
 import categories as categories_dao
 import places as places_dao
 import interactions as interactions_dao
+import documents as documents_dao
+
+# Build heavy list responses in Postgres and pass the JSON text through as-is
+PG_JSON_RESPONSES = os.getenv("PG_JSON_RESPONSES", "").lower() in ("1", "true", "yes")
+
+def json_text_response(body: str) -> Response:
+    """Send JSON produced by the database without decoding or re-encoding it."""
+    return Response(content=body, media_type="application/json")
 
 app = FastAPI(title="Find D Lime")
 
+# Hand DB connections back to the pool as soon as each endpoint returns, and
+# encode results with each route's precompiled response_model serializer
+app.router.route_class = serializers.TypedRoute
+
+# Bound in-flight requests and shed overload with 503 (inside CORS so
+# rejections stay readable by the browser)
+if admission.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,21 +56,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Comment pages carry their cursor in a header
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route request/DB metrics, scraped from /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Opt-in slow-query log and per-request query budget (DB_QUERY_LOG=1)
+if querylog.QUERY_LOG_ENABLED:
+    querylog.enable()
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
-    await initialize_db()
+    # Under serve.py the launcher has already initialized the database
+    if not database.SKIP_INITIALIZE:
+        await initialize_db()
+    await start_replicas()
+    await invalidation.start()
+    await placestore.start()
+    await jobs.start()
+    metrics.start_loop_lag_probe()
+    metrics.start_flushing()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    metrics.stop_flushing()
+    metrics.stop_loop_lag_probe()
+    await jobs.stop()
+    await placestore.stop()
+    await invalidation.stop()
     await close_db_connection()
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Authentication endpoints
-@app.post("/api/token")
+@app.post("/api/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: schemas.UserLogin, conn: asyncpg.Connection = Depends(get_db)):
     user = await users_dao.get_user_by_username(conn, username=form_data.username)
+    # Don't hold a pool connection through bcrypt
+    await conn.release()
     
     if not user or not verify_password(form_data.password, user["password_hash"]):
         raise HTTPException(
@@ -54,7 +116,7 @@ async def login_for_access_token(form_data: schemas.UserLogin, conn: asyncpg.Con
     return {"access_token": access_token, "token_type": "bearer"}
 
 # User endpoints
-@app.post("/api/users/")
+@app.post("/api/users/", response_model=schemas.User)
 async def create_user(user: schemas.UserCreate, conn: asyncpg.Connection = Depends(get_db)):
     db_user = await users_dao.get_user_by_username(conn, username=user.username)
     if db_user:
@@ -63,6 +125,9 @@ async def create_user(user: schemas.UserCreate, conn: asyncpg.Connection = Depen
     db_user = await users_dao.get_user_by_email(conn, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    # Don't hold a pool connection through bcrypt; create_user hashes
+    # before its insert, which acquires again
+    await conn.release()
     
     return await users_dao.create_user(
         conn=conn, 
@@ -71,16 +136,16 @@ async def create_user(user: schemas.UserCreate, conn: asyncpg.Connection = Depen
         password=user.password
     )
 
-@app.get("/api/users/me/")
+@app.get("/api/users/me/", response_model=schemas.User)
 async def read_users_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
 # Category endpoints
-@app.get("/api/categories/")
+@app.get("/api/categories/", response_model=List[schemas.Category])
 async def read_categories(
     skip: int = 0, 
     limit: int = 100, 
-    conn: asyncpg.Connection = Depends(get_db)
+    conn: asyncpg.Connection = Depends(get_read_db)
 ):
     categories = await categories_dao.get_categories(conn=conn, skip=skip, limit=limit)
     return categories
@@ -88,7 +153,7 @@ async def read_categories(
 # Place endpoints
 # Update these in main.py
 
-@app.post("/api/places/")
+@app.post("/api/places/", response_model=schemas.Place)
 async def create_place(
     place: schemas.PlaceCreate, 
     conn: asyncpg.Connection = Depends(get_db), 
@@ -107,7 +172,7 @@ async def create_place(
         osm_tags=place.osm_tags
     )
 
-@app.put("/api/places/{place_id}")
+@app.put("/api/places/{place_id}", response_model=schemas.Place)
 async def update_place(
     place_id: int,
     place_update: schemas.PlaceUpdate,
@@ -132,30 +197,155 @@ async def update_place(
     
     return updated_place
 
-@app.get("/api/places/")
+@app.get("/api/places/", response_model=List[schemas.Place])
 async def read_places(
     skip: int = 0, 
     limit: int = 100, 
     category_id: Optional[int] = None,
-    conn: asyncpg.Connection = Depends(get_db)
+    category_ids: Optional[List[int]] = Query(None),
+    category_match: Literal["any", "all"] = "any",
+    last_comment: bool = False,
+    conn: asyncpg.Connection = Depends(get_read_db),
+    viewer: Optional[dict] = Depends(get_current_user_optional)
 ):
+    """List places, newest first.
+
+    Filter with ``category_ids`` (repeatable); ``category_match=all`` keeps
+    only places in every listed category instead of any of them.
+    ``last_comment=true`` adds a snippet of each place's newest comment.
+    """
+    # The Postgres-built documents don't carry comment snippets
+    if PG_JSON_RESPONSES and not last_comment:
+        return json_text_response(await documents_dao.get_places_json(
+            conn=conn,
+            skip=skip,
+            limit=limit,
+            category_id=category_id,
+            viewer_id=viewer["id"] if viewer else None,
+            category_ids=category_ids,
+            match_all=category_match == "all"
+        ))
+    
     places = await places_dao.get_places(
         conn=conn, 
         skip=skip, 
         limit=limit, 
-        category_id=category_id
+        category_id=category_id,
+        category_ids=category_ids,
+        match_all=category_match == "all"
     )
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    if viewer:
+        await interactions_dao.attach_viewer_state(conn=conn, user_id=viewer["id"], places=places)
     return places
 
-@app.get("/api/places/{place_id}")
-async def read_place(place_id: int, conn: asyncpg.Connection = Depends(get_db)):
-    db_place = await places_dao.get_place_with_comments(conn=conn, place_id=place_id)
+# Declared before /api/places/{place_id} so these paths aren't taken for an id
+@app.get("/api/places/heatmap", response_model=schemas.Heatmap)
+async def read_places_heatmap(
+    bbox: str,
+    resolution: int = Query(64, ge=1, le=heatmap.MAX_RESOLUTION),
+    weight: Literal[heatmap.WEIGHTS] = "count",
+    conn: asyncpg.Connection = Depends(get_read_db)
+):
+    """Place density over ``bbox`` (south,west,north,east) as sparse grid cells.
+
+    ``resolution`` is the number of cells along the longer side; the grid is
+    snapped outwards to shared cell boundaries, so the returned bounds can
+    be slightly larger than requested.
+    """
+    try:
+        south, west, north, east = heatmap.parse_bbox(bbox)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be south,west,north,east")
+    return await heatmap.get_heatmap(conn, south, west, north, east, resolution, weight)
+
+@app.get("/api/places/hot", response_model=List[schemas.HotPlace])
+async def read_hot_places(
+    window: Literal[tuple(activity.WINDOWS)] = "24h",
+    limit: int = Query(10, ge=1, le=100),
+    conn: asyncpg.Connection = Depends(get_read_db)
+):
+    """Places with the most recent engagement, highest score first."""
+    return await activity.get_hot_places(conn, window, limit)
+
+@app.get("/api/places/snapshot")
+async def read_places_snapshot(request: Request, conn: asyncpg.Connection = Depends(get_read_db)):
+    """Every place in the compact binary format described in snapshot.py."""
+    current = await snapshot.get_snapshot(conn)
+    gzipped = snapshot.accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": current.gzipped_etag if gzipped else current.etag,
+        "X-Data-Version": str(current.version),
+        "Cache-Control": f"public, max-age={int(snapshot.SNAPSHOT_REFRESH_INTERVAL)}",
+        "Vary": "Accept-Encoding",
+    }
+    if snapshot.etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=current.gzipped, media_type="application/octet-stream", headers=headers)
+    return Response(content=current.body, media_type="application/octet-stream", headers=headers)
+
+@app.get("/api/places/{place_id}", response_model=schemas.PlaceDetail)
+async def read_place(
+    place_id: int,
+    request: Request,
+    conn: asyncpg.Connection = Depends(get_read_db),
+    viewer: Optional[dict] = Depends(get_current_user_optional)
+):
+    db_place = await places_dao.get_cached_place_with_comments(
+        conn=conn, place_id=place_id, fresh=database.is_recent_writer(request)
+    )
     if db_place is None:
         raise HTTPException(status_code=404, detail="Place not found")
+    if viewer:
+        await interactions_dao.attach_viewer_state(conn=conn, user_id=viewer["id"], places=[db_place])
     return db_place
 
+@app.get("/api/places/{place_id}/activity", response_model=List[schemas.ActivityBucket])
+async def read_place_activity(
+    place_id: int,
+    granularity: Literal[tuple(activity.GRANULARITIES)] = "hour",
+    points: int = Query(24, ge=1, le=168),
+    conn: asyncpg.Connection = Depends(get_read_db)
+):
+    """Likes, dislikes, favorites and comments per hour or day, oldest first."""
+    # Buckets older than the retention are pruned, so longer series would be zero-filled
+    max_points = activity.max_points(granularity)
+    if points > max_points:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"points must be at most {max_points} for granularity {granularity}",
+        )
+    return await activity.get_activity(conn, place_id, granularity, points)
+
+@app.get("/api/places/{place_id}/similar", response_model=List[schemas.ScoredPlace])
+async def read_similar_places(
+    place_id: int,
+    limit: int = Query(10, ge=1, le=similar.SIMILAR_NEIGHBORS),
+    last_comment: bool = False,
+    conn: asyncpg.Connection = Depends(get_read_db),
+    viewer: Optional[dict] = Depends(get_current_user_optional)
+):
+    """Places liked or favorited by the same users, blended with category
+    overlap and distance, best first. Read from the precomputed neighbor
+    list, which is empty until the place's first background rebuild."""
+    ranked = await similar.get_similar(conn=conn, place_id=place_id, limit=limit)
+    places = await places_dao.get_places_by_ids(conn=conn, place_ids=[place["id"] for place in ranked])
+    scores = {place["id"]: place["score"] for place in ranked}
+    for place in places:
+        place["score"] = scores[place["id"]]
+
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    if viewer:
+        await interactions_dao.attach_viewer_state(conn=conn, user_id=viewer["id"], places=places)
+    return places
+
 # Comment endpoints
-@app.post("/api/places/{place_id}/comments/")
+@app.post("/api/places/{place_id}/comments/", response_model=schemas.Comment)
 async def create_comment(
     place_id: int,
     comment: schemas.CommentCreate,
@@ -169,22 +359,55 @@ async def create_comment(
         user_id=current_user["id"]
     )
 
-@app.get("/api/places/{place_id}/comments/")
+@app.get("/api/places/{place_id}/comments/", response_model=List[schemas.Comment])
 async def read_place_comments(
     place_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    conn: asyncpg.Connection = Depends(get_db)
+    before: Optional[str] = None,
+    conn: asyncpg.Connection = Depends(get_read_db)
 ):
-    return await interactions_dao.get_comments_for_place(
-        conn=conn, 
-        place_id=place_id, 
-        skip=skip, 
-        limit=limit
-    )
+    """Get a page of comments, newest first.
+
+    Pass ``before`` (a cursor from ``comments_next_cursor`` or the
+    ``X-Next-Cursor`` header) to page with a keyset scan instead of ``skip``.
+    """
+    if PG_JSON_RESPONSES:
+        try:
+            body, next_cursor = await documents_dao.get_comments_for_place_json(
+                conn=conn,
+                place_id=place_id,
+                skip=skip,
+                limit=limit,
+                before=before
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid comment cursor")
+        
+        json_response = json_text_response(body)
+        if next_cursor:
+            json_response.headers["X-Next-Cursor"] = next_cursor
+        return json_response
+    
+    try:
+        comments = await interactions_dao.get_comments_for_place(
+            conn=conn, 
+            place_id=place_id, 
+            skip=skip, 
+            limit=limit,
+            before=before
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid comment cursor")
+    
+    if comments and len(comments) == limit:
+        response.headers["X-Next-Cursor"] = interactions_dao.encode_comment_cursor(comments[-1])
+    
+    return comments
 
 # Like endpoints
-@app.post("/api/places/{place_id}/like")
+@app.post("/api/places/{place_id}/like", response_model=schemas.Like)
 async def like_place(
     place_id: int,
     like: schemas.LikeCreate,
@@ -199,7 +422,7 @@ async def like_place(
     )
 
 # Favorite endpoints
-@app.post("/api/places/{place_id}/favorite")
+@app.post("/api/places/{place_id}/favorite", response_model=Optional[schemas.Favorite])
 async def favorite_place(
     place_id: int,
     conn: asyncpg.Connection = Depends(get_db),
@@ -211,27 +434,147 @@ async def favorite_place(
         user_id=current_user["id"]
     )
 
-@app.get("/api/users/me/favorites")
+# User-scoped reads share get_current_user's primary connection, so a
+# user always sees their own latest changes
+@app.get("/api/users/me/favorites", response_model=List[schemas.FavoritePlace])
 async def get_user_favorites(
+    last_comment: bool = False,
     conn: asyncpg.Connection = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return await interactions_dao.get_user_favorites(conn=conn, user_id=current_user["id"])
+    if PG_JSON_RESPONSES and not last_comment:
+        return json_text_response(await documents_dao.get_user_favorites_json(conn=conn, user_id=current_user["id"]))
+    
+    places = await interactions_dao.get_user_favorites(conn=conn, user_id=current_user["id"])
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    return await interactions_dao.attach_viewer_state(conn=conn, user_id=current_user["id"], places=places)
 
 # Feed endpoint - get newest places
-@app.get("/api/feed/new")
-async def get_new_places(limit: int = 10, conn: asyncpg.Connection = Depends(get_db)):
-    return await places_dao.get_newest_places(conn=conn, limit=limit)
+@app.get("/api/feed/new", response_model=List[schemas.Place])
+async def get_new_places(
+    limit: int = 10,
+    last_comment: bool = False,
+    conn: asyncpg.Connection = Depends(get_read_db),
+    viewer: Optional[dict] = Depends(get_current_user_optional)
+):
+    if PG_JSON_RESPONSES and not last_comment:
+        return json_text_response(await documents_dao.get_newest_places_json(
+            conn=conn, limit=limit, viewer_id=viewer["id"] if viewer else None
+        ))
+    
+    places = await places_dao.get_newest_places(conn=conn, limit=limit)
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    if viewer:
+        await interactions_dao.attach_viewer_state(conn=conn, user_id=viewer["id"], places=places)
+    return places
 
 # Get top places by likes
-@app.get("/api/feed/top")
-async def get_top_places(limit: int = 10, conn: asyncpg.Connection = Depends(get_db)):
-    return await places_dao.get_top_places(conn=conn, limit=limit)
+@app.get("/api/feed/top", response_model=List[schemas.Place])
+async def get_top_places(
+    limit: int = 10,
+    last_comment: bool = False,
+    conn: asyncpg.Connection = Depends(get_read_db),
+    viewer: Optional[dict] = Depends(get_current_user_optional)
+):
+    if PG_JSON_RESPONSES and not last_comment:
+        return json_text_response(await documents_dao.get_top_places_json(
+            conn=conn, limit=limit, viewer_id=viewer["id"] if viewer else None
+        ))
+    
+    places = await places_dao.get_top_places(conn=conn, limit=limit)
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    if viewer:
+        await interactions_dao.attach_viewer_state(conn=conn, user_id=viewer["id"], places=places)
+    return places
+
+# Personalized feed, scored over the place store
+@app.get("/api/feed/for-you", response_model=List[schemas.ScoredPlace])
+async def get_for_you_places(
+    limit: int = Query(10, ge=1, le=100),
+    last_comment: bool = False,
+    conn: asyncpg.Connection = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Places ranked for the current user by category affinity, proximity
+    to the places they engage with, and freshness, best first.
+
+    Scored over the place store when it is loaded, otherwise in Postgres.
+    """
+    ranked = await foryou.get_for_you(conn=conn, store=placestore.store, user_id=current_user["id"], limit=limit)
+    places = await places_dao.get_places_by_ids(conn=conn, place_ids=[place["id"] for place in ranked])
+    scores = {place["id"]: place["score"] for place in ranked}
+    for place in places:
+        place["score"] = scores[place["id"]]
+    
+    if last_comment:
+        await interactions_dao.attach_last_comments(conn=conn, places=places)
+    return await interactions_dao.attach_viewer_state(conn=conn, user_id=current_user["id"], places=places)
+
+# Map reads answered from the in-process place store (PLACE_STORE=1)
+def get_place_store() -> placestore.PlaceStore:
+    if not placestore.available():
+        raise HTTPException(status_code=503, detail="Place store is not available")
+    return placestore.store
+
+@app.get("/api/map/places", response_model=List[schemas.MapPlace])
+async def map_places_in_bbox(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    any_category: Optional[List[int]] = Query(None),
+    all_categories: Optional[List[int]] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    store: placestore.PlaceStore = Depends(get_place_store)
+):
+    """Places inside a bounding box, newest first."""
+    return store.bbox(south, west, north, east, any_category, all_categories, limit)
+
+@app.get("/api/map/nearby", response_model=List[schemas.MapPlace])
+async def map_places_nearby(
+    latitude: float,
+    longitude: float,
+    radius: float = Query(500, gt=0, le=50_000),
+    any_category: Optional[List[int]] = Query(None),
+    all_categories: Optional[List[int]] = Query(None),
+    limit: int = Query(50, ge=1, le=1000),
+    store: placestore.PlaceStore = Depends(get_place_store)
+):
+    """Places within ``radius`` metres, nearest first."""
+    return store.nearby(latitude, longitude, radius, any_category, all_categories, limit)
+
+@app.get("/api/map/top", response_model=List[schemas.MapPlace])
+async def map_top_places(
+    by: Literal[placestore.TOP_K_FIELDS] = "like_count",
+    any_category: Optional[List[int]] = Query(None),
+    all_categories: Optional[List[int]] = Query(None),
+    limit: int = Query(10, ge=1, le=1000),
+    store: placestore.PlaceStore = Depends(get_place_store)
+):
+    """The places with the highest ``by``."""
+    return store.top(by, any_category, all_categories, limit)
+
+# Delta sync for offline clients
+@app.get("/api/sync", response_model=schemas.SyncResponse)
+async def sync_places(
+    since: Optional[int] = None,
+    conn: asyncpg.Connection = Depends(get_read_db)
+):
+    """Get the places created, updated or deleted since change version ``since``.
+
+    Start without ``since`` (the response has ``reset`` set and the current
+    ``version``), load the map, then pass the last ``version`` back. Keep
+    calling while ``has_more`` is true.
+    """
+    return await changes_dao.get_changes_since(conn=conn, since=since)
 
 # Add these to main.py
 
 # User's places endpoints
-@app.get("/api/users/me/places")
+@app.get("/api/users/me/places", response_model=List[schemas.Place])
 async def get_my_places(
     skip: int = 0,
     limit: int = 100,
@@ -246,7 +589,7 @@ async def get_my_places(
         limit=limit
     )
 
-@app.delete("/api/places/{place_id}")
+@app.delete("/api/places/{place_id}", response_model=schemas.DeleteResponse)
 async def delete_place(
     place_id: int,
     conn: asyncpg.Connection = Depends(get_db),
@@ -0,0 +1,385 @@
+import asyncio
+import json
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for per-request query counts
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# How often the event-loop lag probe wakes up (seconds)
+LOOP_LAG_INTERVAL = 0.5
+
+# Directory shared by every worker process (serve.py sets it). Each worker
+# writes its samples there and /metrics merges all of them, so a scrape
+# sees the whole box whichever worker answers it.
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+# Seconds between writes of this worker's samples to METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Gauges from a worker that hasn't written for this long are dropped, as
+# the worker has exited; its counters still count towards the totals
+METRICS_STALE_AFTER = 3 * METRICS_FLUSH_INTERVAL
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Minimal Prometheus metric types (text exposition format 0.0.4)
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _add(self, total, value):
+        return total + value
+
+    def merge(self, workers: Dict[str, "_WorkerSamples"]) -> Dict[Tuple[str, ...], object]:
+        """Sum this metric's values across every worker's samples."""
+        values: Dict[Tuple[str, ...], object] = {}
+        for worker in workers.values():
+            for key, value in worker.samples.get(self.name, ()):
+                key = tuple(key)
+                values[key] = self._add(values[key], value) if key in values else value
+        return values
+
+    def samples(self, values: Dict[Tuple[str, ...], object]) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in values.items()]
+
+    def render(self, values: Dict[Tuple[str, ...], object]) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + self.samples(values)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def clear(self):
+        self._values.clear()
+
+    def merge(self, workers: Dict[str, "_WorkerSamples"]) -> Dict[Tuple[str, ...], object]:
+        """Keep each live worker's value, labelled with its worker id."""
+        values: Dict[Tuple[str, ...], object] = {}
+        for worker_id, worker in workers.items():
+            if worker.live:
+                for key, value in worker.samples.get(self.name, ()):
+                    values[tuple(key) + (worker_id,)] = value
+        return values
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        if len(key) > len(self.labelnames):
+            # Merged across workers; the last key part is the worker id
+            return super()._format_labels(key[:-1], (("worker", key[-1]),) + extra)
+        return super()._format_labels(key, extra)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _add(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [per-bucket counts..., sum, count]
+            state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self, values: Dict[Tuple[str, ...], object]) -> List[str]:
+        lines = []
+        for key, state in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', repr(float(bound))),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, (('le', '+Inf'),))} {state[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {state[-1]}")
+        return lines
+
+
+_registry: List[_Metric] = []
+_collectors: List[Callable[[], None]] = []
+
+
+def add_collector(collector: Callable[[], None]):
+    """Register a callback that refreshes gauges right before each scrape."""
+    _collectors.append(collector)
+
+
+class _WorkerSamples:
+    """One worker's metric values as read back from METRICS_DIR."""
+
+    __slots__ = ("samples", "live")
+
+    def __init__(self, samples: Dict[str, list], live: bool):
+        self.samples = samples
+        self.live = live
+
+
+def _collect():
+    for collector in _collectors:
+        collector()
+
+
+def _write_samples():
+    """Write this worker's values to METRICS_DIR, replacing its last file."""
+    samples = {metric.name: [[list(key), value] for key, value in metric._values.items()] for metric in _registry}
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(samples, f)
+    os.replace(path + ".tmp", path)
+
+
+def _read_samples() -> Dict[str, _WorkerSamples]:
+    workers = {}
+    now = time.time()
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            with open(path) as f:
+                samples = json.load(f)
+            live = now - os.path.getmtime(path) < METRICS_STALE_AFTER
+        except (OSError, ValueError):
+            continue
+        workers[name[:-len(".json")]] = _WorkerSamples(samples, live)
+    return workers
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text format.
+
+    With METRICS_DIR set, the values are merged across all workers.
+    """
+    _collect()
+    if METRICS_DIR:
+        _write_samples()
+        workers = _read_samples()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(metric.merge(workers) if METRICS_DIR else metric._values))
+    return "\n".join(lines) + "\n"
+
+
+# HTTP metrics
+REQUESTS = Counter("app_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+REQUEST_LATENCY = Histogram("app_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+REQUEST_DB_QUERIES = Histogram("app_http_request_db_queries", "Database queries issued per request.", ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("app_http_request_db_seconds", "Time spent in database queries per request.", ("route",))
+
+# Database metrics
+DB_QUERIES = Counter("app_db_queries_total", "Database queries by route.", ("route",))
+DB_POOL_SIZE = Gauge("app_db_pool_size", "Open connections in the pool.", ("pool",))
+DB_POOL_IN_USE = Gauge("app_db_pool_in_use", "Connections currently checked out of the pool.", ("pool",))
+DB_POOL_WAITERS = Gauge("app_db_pool_waiters", "Requests waiting to acquire a pool connection.", ("pool",))
+DB_POOL_ACQUIRE_TIME = Histogram("app_db_pool_acquire_seconds", "Time spent waiting for a pool connection.", ("pool",))
+
+# Runtime metrics
+EVENT_LOOP_LAG = Gauge("app_event_loop_lag_seconds", "Most recent event-loop scheduling delay.")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram("app_event_loop_lag_distribution_seconds", "Event-loop scheduling delay.")
+
+# Cache metrics
+CACHE_REQUESTS = Counter("app_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("app_cache_hit_ratio", "Fraction of cache lookups that hit since startup.", ("cache",))
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup for the hit-ratio metrics."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _collect_cache_ratios():
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in CACHE_REQUESTS._values.items():
+        hits_and_total = totals.setdefault(cache, [0, 0])
+        if result == "hit":
+            hits_and_total[0] += count
+        hits_and_total[1] += count
+    for cache, (hits, total) in totals.items():
+        CACHE_HIT_RATIO.set(hits / total if total else 0.0, cache=cache)
+
+
+add_collector(_collect_cache_ratios)
+
+
+# Per-request database accounting
+class RequestStats:
+    """Database work done while handling one request."""
+
+    __slots__ = ("queries", "db_time", "statements")
+
+    def __init__(self, keep_statements: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        # (query, duration) pairs, only kept while a request observer is registered
+        self.statements: Optional[List[Tuple[str, float]]] = [] if keep_statements else None
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+_request_observers: List[Callable[[str, RequestStats], None]] = []
+
+
+def add_request_observer(observer: Callable[[str, RequestStats], None]):
+    """Call observer(route, stats) after every request.
+
+    While any observer is registered, requests also keep the text and
+    duration of each statement they ran.
+    """
+    _request_observers.append(observer)
+
+
+def record_query(duration: float, query: Optional[str] = None):
+    """Attribute one finished query to the current request, if any."""
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.statements is not None:
+            stats.statements.append((query, duration))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts, latency and DB usage."""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[Callable, str]] = None
+
+    def _route_label(self, scope) -> str:
+        # Label by route template (/api/places/{place_id}) to keep cardinality bounded
+        if self._route_paths is None:
+            router = scope["app"].router
+            self._route_paths = {route.endpoint: route.path for route in router.routes if hasattr(route, "endpoint")}
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_statements=bool(_request_observers))
+        token = request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            request_stats.reset(token)
+            route = self._route_label(scope)
+            method = scope["method"]
+            REQUESTS.inc(route=route, method=method, status=status_code)
+            REQUEST_LATENCY.observe(duration, route=route, method=method)
+            REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+            REQUEST_DB_TIME.observe(stats.db_time, route=route)
+            if stats.queries:
+                DB_QUERIES.inc(stats.queries, route=route)
+            for observer in _request_observers:
+                observer(route, stats)
+
+
+# Event-loop lag probe
+_loop_lag_task = None
+
+
+async def _probe_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - expected)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+def start_loop_lag_probe():
+    """Start measuring event-loop lag in the background."""
+    global _loop_lag_task
+    if _loop_lag_task is None:
+        _loop_lag_task = asyncio.create_task(_probe_loop_lag())
+
+
+def stop_loop_lag_probe():
+    global _loop_lag_task
+    if _loop_lag_task is not None:
+        _loop_lag_task.cancel()
+        _loop_lag_task = None
+
+
+# Sharing samples with the other workers
+_flush_task = None
+
+
+async def _flush_samples():
+    while True:
+        try:
+            _collect()
+            _write_samples()
+        except OSError:
+            pass
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+
+
+def start_flushing():
+    """Write this worker's samples to METRICS_DIR periodically, if it is set."""
+    global _flush_task
+    if METRICS_DIR and _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_samples())
+
+
+def stop_flushing():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
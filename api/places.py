@@ -1,117 +1,151 @@
 import asyncpg
 import json
+import os
+from collections import defaultdict
 from typing import List, Dict, Any, Optional
 
+import cache
+import changes
+import foryou
+import similar
+import interactions
+import invalidation
+import queries
+import singleflight
+
+# Number of comments embedded in the place detail response
+COMMENT_PREVIEW_LIMIT = 10
+
+# Hydrated place details (place + categories + counts + comment preview) by id
+PLACE_CACHE_SIZE = int(os.getenv("PLACE_CACHE_SIZE", "2000"))
+PLACE_CACHE_TTL = float(os.getenv("PLACE_CACHE_TTL", "60"))
+
+place_details = cache.LRUCache("place_detail", PLACE_CACHE_SIZE, PLACE_CACHE_TTL)
+invalidation.subscribe(invalidation.PLACE, place_details.invalidate)
+
+# Counts for a place deleted between the list query and the counts query
+NO_COUNTS = {'like_count': 0, 'dislike_count': 0, 'favorite_count': 0}
+
+# Concurrent identical reads share one load (see singleflight.py)
+detail_flights = singleflight.SingleFlight("place_detail")
+feed_flights = singleflight.SingleFlight("feed")
+
+
+# Row shaping
+def format_place(place: asyncpg.Record, categories: List[asyncpg.Record]) -> Dict[str, Any]:
+    """Convert a place row to a dict with its categories as a list of dicts."""
+    place_dict = dict(place)
+    place_dict['categories'] = [dict(category) for category in categories]
+    return place_dict
+
 
 # Place CRUD operations
+async def _categories_by_place(conn: asyncpg.Connection, place_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    categories = defaultdict(list)
+    for row in await queries.fetch(conn, "places.categories_for_places", place_ids):
+        category = dict(row)
+        categories[category.pop("place_id")].append(category)
+    return categories
+
+
+async def _shape_places(conn: asyncpg.Connection, places: List[asyncpg.Record]) -> List[Dict[str, Any]]:
+    """Attach categories and engagement counts to place rows.
+
+    Two queries in total however many places there are: one for the
+    categories and one for the counts.
+    """
+    if not places:
+        return []
+    place_ids = [place['id'] for place in places]
+    categories = await _categories_by_place(conn, place_ids)
+    counts = {}
+    for row in await queries.fetch(conn, "places.counts_for_places", place_ids):
+        place_counts = dict(row)
+        counts[place_counts.pop('place_id')] = place_counts
+
+    result = []
+    for place in places:
+        place_dict = format_place(place, categories.get(place['id'], []))
+        place_dict.update(counts.get(place['id'], NO_COUNTS))
+        result.append(place_dict)
+    return result
+
+
 async def get_place(conn: asyncpg.Connection, place_id: int) -> Optional[Dict[str, Any]]:
     """Get a place by ID with all its categories."""
-    place = await conn.fetchrow(
-        """
-        SELECT p.id, p.name, p.description, p.latitude, p.longitude, 
-               p.user_id, p.created_at, p.updated_at,
-               p.osm_id, p.is_osm_imported, p.osm_tags,
-               u.username as user_username
-        FROM places p
-        LEFT JOIN users u ON p.user_id = u.id
-        WHERE p.id = $1
-        """,
-        place_id
-    )
+    place = await queries.fetchrow(conn, "places.by_id", place_id)
     
     if not place:
         return None
     
-    # Convert to dict and add categories
-    place_dict = dict(place)
-    
-    # Get all categories for this place
-    categories = await conn.fetch(
-        """
-        SELECT c.id, c.name, c.color, c.icon
-        FROM categories c
-        JOIN place_categories pc ON c.id = pc.category_id
-        WHERE pc.place_id = $1
-        ORDER BY c.name
-        """,
-        place_id
-    )
-    
-    place_dict['categories'] = [dict(category) for category in categories]
-    
-    # Get likes count
-    likes_count = await conn.fetchval(
-        """
-        SELECT COUNT(*) FROM likes 
-        WHERE place_id = $1 AND is_like = TRUE
-        """,
-        place_id
-    )
-    
-    # Get dislikes count
-    dislikes_count = await conn.fetchval(
-        """
-        SELECT COUNT(*) FROM likes 
-        WHERE place_id = $1 AND is_like = FALSE
-        """,
-        place_id
-    )
-    
-    # Get favorites count
-    favorites_count = await conn.fetchval(
-        """
-        SELECT COUNT(*) FROM favorites 
-        WHERE place_id = $1
-        """,
-        place_id
-    )
-    
-    place_dict['like_count'] = likes_count
-    place_dict['dislike_count'] = dislikes_count
-    place_dict['favorite_count'] = favorites_count
-    
-    return place_dict
+    return (await _shape_places(conn, [place]))[0]
+
 
+async def get_place_with_comments(
+    conn: asyncpg.Connection,
+    place_id: int,
+    comment_limit: int = COMMENT_PREVIEW_LIMIT
+) -> Optional[Dict[str, Any]]:
+    """Get a place by ID with its categories and newest comments.
 
-async def get_place_with_comments(conn: asyncpg.Connection, place_id: int) -> Optional[Dict[str, Any]]:
-    """Get a place by ID with its category and comments."""
+    Only the newest ``comment_limit`` comments are embedded. The rest are
+    reachable through the comments endpoint with ``comments_next_cursor``.
+    """
     # Get the place first
     place_dict = await get_place(conn, place_id)
 
     if not place_dict:
         return None
 
-    # Get comments for the place
-    comments = await conn.fetch(
-        """
-        SELECT c.id, c.content, c.place_id, c.user_id, c.created_at, c.updated_at,
-               u.username as user_username, u.email as user_email
-        FROM comments c
-        JOIN users u ON c.user_id = u.id
-        WHERE c.place_id = $1
-        ORDER BY c.created_at DESC
-        """,
-        place_id,
-    )
-
-    # Format comments with user info
-    formatted_comments = []
-    for comment in comments:
-        comment_dict = dict(comment)
-        comment_dict["user"] = {"id": comment_dict["user_id"], "username": comment_dict["user_username"], "email": comment_dict["user_email"]}
-
-        # Clean up redundant keys
-        for key in ["user_username", "user_email"]:
-            if key in comment_dict:
-                del comment_dict[key]
-
-        formatted_comments.append(comment_dict)
-
-    place_dict["comments"] = formatted_comments
+    # Fetch one extra comment to know whether there is another page
+    comments = await interactions.get_comments_for_place(conn, place_id, limit=comment_limit + 1)
+    has_more = len(comments) > comment_limit
+    comments = comments[:comment_limit]
+
+    # comment_count comes from the place row's counter
+    place_dict["comments"] = comments
+    place_dict["comments_next_cursor"] = interactions.encode_comment_cursor(comments[-1]) if has_more else None
 
     return place_dict
 
 
+async def get_cached_place_with_comments(
+    conn: asyncpg.Connection,
+    place_id: int,
+    fresh: bool = False
+) -> Optional[Dict[str, Any]]:
+    """get_place_with_comments, served from the place detail cache when possible.
+
+    Misses are loaded over ``conn``, the request's read connection. Pass
+    ``fresh`` when the requester wrote recently (conn is then the primary):
+    the cached entry is skipped and replaced with the primary's row, so a
+    writer never reads back an entry a lagging replica refilled with the
+    row from before their write.
+
+    Returns a shallow copy, so callers may add keys (viewer state) but must
+    not mutate the nested lists.
+    """
+    place_dict = None if fresh else place_details.get(place_id)
+    if place_dict is None:
+        token = place_details.token()
+        # Keyed by token too, so requests after an invalidation don't join
+        # a load that started before the write, and by fresh, so writers
+        # don't join a replica load
+        place_dict = await detail_flights.do(
+            (place_id, token, fresh), lambda: _load_place_detail(conn, place_id, token)
+        )
+        if place_dict is None:
+            return None
+    return dict(place_dict)
+
+
+async def _load_place_detail(conn: asyncpg.Connection, place_id: int, token: int) -> Optional[Dict[str, Any]]:
+    place_dict = await get_place_with_comments(conn, place_id)
+    if place_dict is not None:
+        place_details.set(place_id, place_dict, token)
+    return place_dict
+
+
 async def create_place(
     conn: asyncpg.Connection,
     name: str,
@@ -125,332 +159,115 @@ async def create_place(
     osm_tags: Optional[Dict] = None,
 ) -> Dict[str, Any]:
     """Create a new place with multiple categories."""
-    # First create the place
-    place = await conn.fetchrow(
-        """
-        INSERT INTO places (
-            name, description, latitude, longitude, 
-            user_id, osm_id, is_osm_imported, osm_tags
+    async with conn.transaction():
+        # First create the place
+        place = await queries.fetchrow(
+            conn,
+            "places.create",
+            name,
+            description,
+            latitude,
+            longitude,
+            user_id,
+            osm_id,
+            is_osm_imported,
+            json.dumps(osm_tags) if osm_tags else None,
         )
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-        RETURNING id, name, description, latitude, longitude, 
-                 user_id, created_at, updated_at,
-                 osm_id, is_osm_imported, osm_tags
-        """,
-        name,
-        description,
-        latitude,
-        longitude,
-        user_id,
-        osm_id,
-        is_osm_imported,
-        json.dumps(osm_tags) if osm_tags else None,
-    )
-
-    place_dict = dict(place)
-    place_id = place_dict["id"]
-
-    # Add categories if provided
-    if category_ids and len(category_ids) > 0:
-        categories = []
-        for category_id in category_ids:
-            # Add to junction table
-            await conn.execute(
-                """
-                INSERT INTO place_categories (place_id, category_id)
-                VALUES ($1, $2)
-                ON CONFLICT (place_id, category_id) DO NOTHING
-                """,
-                place_id,
-                category_id,
-            )
-
-            # Get category info
-            category = await conn.fetchrow(
-                """
-                SELECT id, name, color, icon
-                FROM categories
-                WHERE id = $1
-                """,
-                category_id,
-            )
-
-            if category:
-                categories.append(dict(category))
-
-        place_dict["categories"] = categories
-    else:
-        place_dict["categories"] = []
 
-    return place_dict
+        place_dict = dict(place)
+        place_id = place_dict["id"]
 
+        # Add categories if provided
+        if category_ids and len(category_ids) > 0:
+            categories = []
+            for category_id in category_ids:
+                # Add to junction table
+                await queries.execute(conn, "places.add_category", place_id, category_id)
 
-async def get_newest_places(conn: asyncpg.Connection, limit: int = 10) -> List[Dict[str, Any]]:
-    """Get the newest places."""
-    places = await conn.fetch(
-        """
-        SELECT p.id, p.name, p.description, p.latitude, p.longitude, 
-               p.category_id, p.user_id, p.created_at, p.updated_at,
-               c.id as category_id, c.name as category_name, 
-               c.color as category_color, c.icon as category_icon
-        FROM places p
-        LEFT JOIN categories c ON p.category_id = c.id
-        ORDER BY p.created_at DESC
-        LIMIT $1
-        """,
-        limit,
-    )
+                # Get category info
+                category = await queries.fetchrow(conn, "categories.brief", category_id)
 
-    result = []
-    for place in places:
-        place_dict = dict(place)
+                if category:
+                    categories.append(dict(category))
 
-        # Add category as nested object
-        if place_dict.get("category_id"):
-            place_dict["category"] = {"id": place_dict["category_id"], "name": place_dict["category_name"], "color": place_dict["category_color"], "icon": place_dict["category_icon"]}
+            place_dict["categories"] = categories
+            await queries.execute(conn, "places.sync_category_ids", place_id)
         else:
-            place_dict["category"] = None
-
-        # Clean up redundant keys
-        for key in ["category_name", "category_color", "category_icon"]:
-            if key in place_dict:
-                del place_dict[key]
+            place_dict["categories"] = []
 
-        result.append(place_dict)
+        await foryou.mark_stale(conn, user_id)
+        await similar.mark_stale(conn, place_id)
+        await changes.record(conn, changes.PLACE, place_id)
 
-    return result
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
+    return place_dict
 
 
 async def get_newest_places(conn: asyncpg.Connection, limit: int = 10) -> List[Dict[str, Any]]:
     """Get the newest places."""
-    # First get the base places data
-    places = await conn.fetch(
-        """
-        SELECT p.id, p.name, p.description, p.latitude, p.longitude, 
-               p.user_id, p.created_at, p.updated_at,
-               p.osm_id, p.is_osm_imported, p.osm_tags,
-               u.username as user_username
-        FROM places p
-        LEFT JOIN users u ON p.user_id = u.id
-        ORDER BY p.created_at DESC
-        LIMIT $1
-        """,
-        limit
-    )
-    
-    result = []
-    for place in places:
-        place_dict = dict(place)
-        
-        # Get all categories for this place
-        categories = await conn.fetch(
-            """
-            SELECT c.id, c.name, c.color, c.icon
-            FROM categories c
-            JOIN place_categories pc ON c.id = pc.category_id
-            WHERE pc.place_id = $1
-            ORDER BY c.name
-            """,
-            place_dict['id']
-        )
-        
-        place_dict['categories'] = [dict(category) for category in categories]
-        
-        # Get engagement metrics
-        place_id = place_dict['id']
-        
-        # Get likes count
-        likes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = TRUE
-            """,
-            place_id
-        )
-        
-        # Get dislikes count
-        dislikes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = FALSE
-            """,
-            place_id
-        )
-        
-        # Get favorites count
-        favorites_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM favorites 
-            WHERE place_id = $1
-            """,
-            place_id
-        )
-        
-        place_dict['like_count'] = likes_count
-        place_dict['dislike_count'] = dislikes_count
-        place_dict['favorite_count'] = favorites_count
-        
-        result.append(place_dict)
-    
-    return result
+    places = await feed_flights.do(("new", limit), lambda: _load_newest_places(conn, limit))
+    return [dict(place) for place in places]
+
+async def _load_newest_places(conn: asyncpg.Connection, limit: int) -> List[Dict[str, Any]]:
+    places = await queries.fetch(conn, "places.newest", limit)
+    return await _shape_places(conn, places)
 
 async def get_top_places(conn: asyncpg.Connection, limit: int = 10) -> List[Dict[str, Any]]:
     """Get the top places by number of likes."""
-    # Get places with like counts
-    places_with_likes = await conn.fetch(
-        """
-        SELECT p.id, p.name, p.description, p.latitude, p.longitude, 
-               p.user_id, p.created_at, p.updated_at,
-               p.osm_id, p.is_osm_imported, p.osm_tags,
-               u.username as user_username,
-               COUNT(l.id) as like_count
-        FROM places p
-        LEFT JOIN users u ON p.user_id = u.id
-        LEFT JOIN likes l ON p.id = l.place_id AND l.is_like = TRUE
-        GROUP BY p.id, u.username
-        ORDER BY like_count DESC, p.created_at DESC
-        LIMIT $1
-        """,
-        limit
-    )
-    
-    result = []
-    for place in places_with_likes:
-        place_dict = dict(place)
-        
-        # Get all categories for this place
-        categories = await conn.fetch(
-            """
-            SELECT c.id, c.name, c.color, c.icon
-            FROM categories c
-            JOIN place_categories pc ON c.id = pc.category_id
-            WHERE pc.place_id = $1
-            ORDER BY c.name
-            """,
-            place_dict['id']
-        )
-        
-        place_dict['categories'] = [dict(category) for category in categories]
-        
-        # Get additional engagement metrics
-        place_id = place_dict['id']
-        
-        # Get dislikes count
-        dislikes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = FALSE
-            """,
-            place_id
-        )
-        
-        # Get favorites count
-        favorites_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM favorites 
-            WHERE place_id = $1
-            """,
-            place_id
-        )
-        
-        place_dict['dislike_count'] = dislikes_count
-        place_dict['favorite_count'] = favorites_count
-        
-        result.append(place_dict)
-    
-    return result
+    places = await feed_flights.do(("top", limit), lambda: _load_top_places(conn, limit))
+    return [dict(place) for place in places]
 
-# Update the function to get all places
-async def get_places(conn: asyncpg.Connection, skip: int = 0, limit: int = 100, category_id: Optional[int] = None) -> List[Dict[str, Any]]:
-    """Get a list of places with optional category filter."""
-    query = """
-    SELECT DISTINCT p.id, p.name, p.description, p.latitude, p.longitude, 
-           p.user_id, p.created_at, p.updated_at,
-           p.osm_id, p.is_osm_imported,
-           u.username as user_username
-    FROM places p
-    LEFT JOIN users u ON p.user_id = u.id
-    """
-
-    params = []
-    where_clause = []
+async def _load_top_places(conn: asyncpg.Connection, limit: int) -> List[Dict[str, Any]]:
+    places = await queries.fetch(conn, "places.top", limit)
+    return await _shape_places(conn, places)
 
+def category_filter(category_id: Optional[int], category_ids: Optional[List[int]]) -> List[int]:
+    """Merge the single and multi-category filter params into one id list."""
+    merged = set(category_ids or ())
     if category_id is not None:
-        query += """
-        JOIN place_categories pc ON p.id = pc.place_id
-        """
-        where_clause.append("pc.category_id = $1")
-        params.append(category_id)
-
-    if where_clause:
-        query += " WHERE " + " AND ".join(where_clause)
-
-    query += """
-    ORDER BY p.created_at DESC
-    LIMIT ${}
-    OFFSET ${}
-    """.format(
-        len(params) + 1, len(params) + 2
-    )
-
-    params.extend([limit, skip])
-
-    places = await conn.fetch(query, *params)
+        merged.add(category_id)
+    return sorted(merged)
 
-    result = []
-    for place in places:
-        place_dict = dict(place)
-
-        # Get all categories for this place
-        categories = await conn.fetch(
-            """
-            SELECT c.id, c.name, c.color, c.icon
-            FROM categories c
-            JOIN place_categories pc ON c.id = pc.category_id
-            WHERE pc.place_id = $1
-            ORDER BY c.name
-            """,
-            place_dict["id"],
-        )
-
-        place_dict["categories"] = [dict(category) for category in categories]
-
-        # Get counts
-        place_id = place_dict["id"]
-
-        # Get likes count
-        likes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = TRUE
-            """,
-            place_id,
-        )
+# Update the function to get all places
+async def get_places(
+    conn: asyncpg.Connection,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    category_ids: Optional[List[int]] = None,
+    match_all: bool = False
+) -> List[Dict[str, Any]]:
+    """Get a list of places with optional category filter.
+
+    ``category_ids`` matches places in any of the categories, or in all of
+    them with ``match_all``. ``category_id`` is the single-category form.
+    """
+    category_ids = category_filter(category_id, category_ids)
+    if category_ids:
+        query = "places.list_all_categories" if match_all else "places.list_any_categories"
+        places = await queries.fetch(conn, query, limit, skip, category_ids)
+    else:
+        places = await queries.fetch(conn, "places.list", limit, skip)
 
-        # Get dislikes count
-        dislikes_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM likes 
-            WHERE place_id = $1 AND is_like = FALSE
-            """,
-            place_id,
-        )
+    return await _shape_places(conn, places)
 
-        # Get favorites count
-        favorites_count = await conn.fetchval(
-            """
-            SELECT COUNT(*) FROM favorites 
-            WHERE place_id = $1
-            """,
-            place_id,
-        )
 
-        place_dict["like_count"] = likes_count
-        place_dict["dislike_count"] = dislikes_count
-        place_dict["favorite_count"] = favorites_count
+async def get_places_by_ids(conn: asyncpg.Connection, place_ids: List[int]) -> List[Dict[str, Any]]:
+    """Get places in the get_places shape with two batched queries.
 
-        result.append(place_dict)
+    Places come back in the order of place_ids; missing ids are skipped.
+    """
+    if not place_ids:
+        return []
+    places = {place["id"]: dict(place) for place in await queries.fetch(conn, "places.by_ids", place_ids)}
+    categories = await _categories_by_place(conn, place_ids)
 
+    result = []
+    for place_id in place_ids:
+        place_dict = places.get(place_id)
+        if place_dict is not None:
+            place_dict["categories"] = categories.get(place_id, [])
+            result.append(place_dict)
     return result
 
 
@@ -459,92 +276,52 @@ async def update_place(
     conn: asyncpg.Connection, place_id: int, user_id: int, name: Optional[str] = None, description: Optional[str] = None, category_ids: Optional[List[int]] = None  # Changed from category_id
 ) -> Optional[Dict[str, Any]]:
     """Update a place's details, including multiple categories."""
-    # First check if the place exists and belongs to the user
-    place = await conn.fetchrow(
-        """
-        SELECT id FROM places
-        WHERE id = $1 AND user_id = $2
-        """,
-        place_id,
-        user_id,
-    )
+    async with conn.transaction():
+        # First check if the place exists and belongs to the user
+        place = await queries.fetchrow(conn, "places.owned", place_id, user_id)
 
-    if not place:
-        return None  # Place not found or doesn't belong to user
-
-    # Build update query parts
-    update_parts = []
-    params = [place_id]  # First param is always place_id
-
-    if name is not None:
-        update_parts.append(f"name = ${len(params) + 1}")
-        params.append(name)
-
-    if description is not None:
-        update_parts.append(f"description = ${len(params) + 1}")
-        params.append(description)
-
-    # Update timestamp
-    update_parts.append("updated_at = CURRENT_TIMESTAMP")
-
-    # Execute the update if there are fields to update
-    if update_parts:
-        query = f"""
-        UPDATE places
-        SET {', '.join(update_parts)}
-        WHERE id = $1
-        """
-        await conn.execute(query, *params)
-
-    # Update categories if provided
-    if category_ids is not None:
-        # Remove all existing categories
-        await conn.execute(
-            """
-            DELETE FROM place_categories
-            WHERE place_id = $1
-            """,
-            place_id,
-        )
+        if not place:
+            return None  # Place not found or doesn't belong to user
 
-        # Add new categories
-        if category_ids and len(category_ids) > 0:
+        # Fields left as None keep their current value
+        await queries.execute(conn, "places.update", place_id, name, description)
+
+        # Update categories if provided
+        if category_ids is not None:
+            # Remove all existing categories
+            await queries.execute(conn, "places.clear_categories", place_id)
+
+            # Add new categories
             for category_id in category_ids:
-                await conn.execute(
-                    """
-                    INSERT INTO place_categories (place_id, category_id)
-                    VALUES ($1, $2)
-                    """,
-                    place_id,
-                    category_id,
-                )
+                await queries.execute(conn, "places.add_category", place_id, category_id)
+
+            await queries.execute(conn, "places.sync_category_ids", place_id)
+            await similar.mark_stale(conn, place_id)
+
+        await changes.record(conn, changes.PLACE, place_id)
+
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
 
     # Return the updated place
     return await get_place(conn, place_id)
 
 async def delete_place(conn: asyncpg.Connection, place_id: int, user_id: int) -> bool:
     """Delete a place (only if it belongs to the user)."""
-    # First check if the place exists and belongs to the user
-    place = await conn.fetchrow(
-        """
-        SELECT id FROM places
-        WHERE id = $1 AND user_id = $2
-        """,
-        place_id,
-        user_id,
-    )
+    async with conn.transaction():
+        # First check if the place exists and belongs to the user
+        place = await queries.fetchrow(conn, "places.owned", place_id, user_id)
 
-    if not place:
-        return False  # Place not found or doesn't belong to user
-
-    # Delete the place and all related data (comments, likes, favorites)
-    # Note: This relies on CASCADE delete constraints in the database
-    await conn.execute(
-        """
-        DELETE FROM places
-        WHERE id = $1
-        """,
-        place_id,
-    )
+        if not place:
+            return False  # Place not found or doesn't belong to user
+
+        # Delete the place and all related data (comments, likes, favorites)
+        # Note: This relies on CASCADE delete constraints in the database
+        await queries.execute(conn, "places.delete", place_id)
+        await foryou.mark_stale(conn, user_id)
+
+        # Leaves a tombstone for delta sync
+        await changes.record(conn, changes.PLACE, place_id)
+
+    await invalidation.publish(conn, invalidation.PLACE, place_id)
 
     return True
@@ -0,0 +1,317 @@
+import asyncio
+import itertools
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import asyncpg
+
+import database
+import invalidation
+import queries
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed with PLACE_STORE=1
+    np = None
+
+# In-process, column-oriented copy of every place for the /api/map reads.
+# Each worker loads it at startup and keeps it fresh from the place
+# invalidations that writes already publish. Needs numpy.
+PLACE_STORE_ENABLED = os.getenv("PLACE_STORE", "").lower() in ("1", "true", "yes")
+
+# Seconds to gather invalidations before re-reading the changed places
+PLACE_STORE_APPLY_DELAY = float(os.getenv("PLACE_STORE_APPLY_DELAY", "0.2"))
+
+# Category masks are uint64, so only the first 64 categories (by id) are filterable
+MAX_CATEGORIES = 64
+
+EARTH_RADIUS_M = 6_371_000.0
+
+TOP_K_FIELDS = ("like_count", "dislike_count", "favorite_count", "created_at")
+
+logger = logging.getLogger("uwi.placestore")
+
+# Source of PlaceStore.version values, unique across reloads
+_versions = itertools.count(1)
+
+
+class PlaceStore:
+    """All places as parallel NumPy arrays, one row per place.
+
+    Queries are vectorized scans over the columns. Rows are replaced in
+    place when a place changes; new places are appended and deleted ones
+    dropped in batches.
+    """
+
+    def __init__(self, categories: List[asyncpg.Record], places: List[asyncpg.Record]):
+        self.category_ids = [category["id"] for category in categories][:MAX_CATEGORIES]
+        self._category_bits = {category_id: bit for bit, category_id in enumerate(self.category_ids)}
+        self.names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+        self._set_columns(self._columns(places))
+        # Changes whenever the data does; derived results can be cached on it
+        self.version = next(_versions)
+
+    def _intern(self, name: Optional[str]) -> int:
+        name = name or ""
+        index = self._name_index.get(name)
+        if index is None:
+            index = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def _mask(self, category_ids: Iterable[int]) -> int:
+        mask = 0
+        for category_id in category_ids:
+            bit = self._category_bits.get(category_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def _columns(self, places: List[asyncpg.Record]) -> Dict[str, Any]:
+        return {
+            "ids": np.array([place["id"] for place in places], dtype=np.int32),
+            "lat": np.array([float(place["latitude"]) for place in places], dtype=np.float64),
+            "lon": np.array([float(place["longitude"]) for place in places], dtype=np.float64),
+            "masks": np.array([self._mask(place["category_ids"]) for place in places], dtype=np.uint64),
+            "like_count": np.array([place["like_count"] for place in places], dtype=np.int32),
+            "dislike_count": np.array([place["dislike_count"] for place in places], dtype=np.int32),
+            "favorite_count": np.array([place["favorite_count"] for place in places], dtype=np.int32),
+            "created_at": np.array([place["created_at"].timestamp() for place in places], dtype=np.float64),
+            "name_idx": np.array([self._intern(place["name"]) for place in places], dtype=np.int32),
+        }
+
+    def _set_columns(self, columns: Dict[str, Any]):
+        self.ids = columns["ids"]
+        self.lat = columns["lat"]
+        self.lon = columns["lon"]
+        self.masks = columns["masks"]
+        self.like_count = columns["like_count"]
+        self.dislike_count = columns["dislike_count"]
+        self.favorite_count = columns["favorite_count"]
+        self.created_at = columns["created_at"]
+        self.name_idx = columns["name_idx"]
+        self._rows = {int(place_id): row for row, place_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _all_columns(self) -> Dict[str, Any]:
+        return {
+            "ids": self.ids, "lat": self.lat, "lon": self.lon, "masks": self.masks,
+            "like_count": self.like_count, "dislike_count": self.dislike_count,
+            "favorite_count": self.favorite_count, "created_at": self.created_at, "name_idx": self.name_idx,
+        }
+
+    def apply(self, place_ids: Set[int], places: List[asyncpg.Record]):
+        """Replace the rows for place_ids with freshly read rows.
+
+        Ids in place_ids that are missing from places were deleted.
+        """
+        fresh = self._columns(places)
+        columns = self._all_columns()
+        new_rows = []
+        for position, place_id in enumerate(fresh["ids"]):
+            row = self._rows.get(int(place_id))
+            if row is None:
+                new_rows.append(position)
+                continue
+            for name, column in columns.items():
+                column[row] = fresh[name][position]
+
+        found = {int(place_id) for place_id in fresh["ids"]}
+        deleted = [self._rows[place_id] for place_id in place_ids - found if place_id in self._rows]
+        if new_rows or deleted:
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[deleted] = False
+            self._set_columns({
+                name: np.concatenate([column[keep], fresh[name][new_rows]])
+                for name, column in columns.items()
+            })
+        self.version = next(_versions)
+
+    # Reads
+    def distances(self, latitude: float, longitude: float):
+        """Metres from (latitude, longitude) to every row."""
+        # Equirectangular approximation; accurate to well under 1% at campus scale
+        x = np.radians(self.lon - longitude) * math.cos(math.radians(latitude))
+        y = np.radians(self.lat - latitude)
+        return EARTH_RADIUS_M * np.sqrt(x * x + y * y)
+
+    def category_scores(self, weights: Dict[int, float]):
+        """Per row, the sum of `weights` over the place's categories."""
+        scores = np.zeros(len(self.ids))
+        for category_id, weight in weights.items():
+            bit = self._category_bits.get(category_id)
+            if bit is not None:
+                scores += weight * ((self.masks >> np.uint64(bit)) & np.uint64(1))
+        return scores
+
+    def _category_filter(self, any_of: Optional[List[int]], all_of: Optional[List[int]]):
+        selected = np.ones(len(self.ids), dtype=bool)
+        if any_of:
+            selected &= (self.masks & np.uint64(self._mask(any_of))) != 0
+        if all_of:
+            if any(category_id not in self._category_bits for category_id in all_of):
+                return np.zeros(len(self.ids), dtype=bool)
+            all_mask = np.uint64(self._mask(all_of))
+            selected &= (self.masks & all_mask) == all_mask
+        return selected
+
+    def _records(self, rows, extra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        records = []
+        for position, row in enumerate(rows):
+            mask = int(self.masks[row])
+            record = {
+                "id": int(self.ids[row]),
+                "name": self.names[self.name_idx[row]],
+                "latitude": float(self.lat[row]),
+                "longitude": float(self.lon[row]),
+                "category_ids": [category_id for bit, category_id in enumerate(self.category_ids) if mask >> bit & 1],
+                "like_count": int(self.like_count[row]),
+                "dislike_count": int(self.dislike_count[row]),
+                "favorite_count": int(self.favorite_count[row]),
+                "created_at": datetime.fromtimestamp(self.created_at[row], timezone.utc),
+            }
+            for key, values in (extra or {}).items():
+                record[key] = float(values[position])
+            records.append(record)
+        return records
+
+    def bbox(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        any_of: Optional[List[int]] = None,
+        all_of: Optional[List[int]] = None,
+        limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        """Places inside a lat/lon box, newest first."""
+        selected = self._category_filter(any_of, all_of)
+        selected &= (self.lat >= south) & (self.lat <= north) & (self.lon >= west) & (self.lon <= east)
+        return self._records(self._top_rows(np.flatnonzero(selected), self.created_at, limit))
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float,
+        any_of: Optional[List[int]] = None,
+        all_of: Optional[List[int]] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Places within radius_m metres, nearest first (with distance_m)."""
+        distance = self.distances(latitude, longitude)
+        rows = np.flatnonzero(self._category_filter(any_of, all_of) & (distance <= radius_m))
+        rows = rows[np.argsort(distance[rows], kind="stable")][:limit]
+        return self._records(rows, {"distance_m": distance[rows]})
+
+    def top(
+        self,
+        by: str = "like_count",
+        any_of: Optional[List[int]] = None,
+        all_of: Optional[List[int]] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """The `limit` places with the highest `by` (one of TOP_K_FIELDS)."""
+        rows = np.flatnonzero(self._category_filter(any_of, all_of))
+        return self._records(self._top_rows(rows, getattr(self, by), limit))
+
+    def best(self, scores, limit: int):
+        """Rows with the `limit` highest finite scores, best first."""
+        return self._top_rows(np.flatnonzero(np.isfinite(scores)), scores, limit)
+
+    @staticmethod
+    def _top_rows(rows, values, limit: int):
+        """rows ordered by values descending, cut to limit, via argpartition."""
+        if limit < len(rows):
+            rows = rows[np.argpartition(-values[rows], limit - 1)[:limit]]
+        return rows[np.argsort(-values[rows], kind="stable")]
+
+
+store: Optional[PlaceStore] = None
+_dirty: Set[int] = set()
+_reload = False
+_wakeup: Optional[asyncio.Event] = None
+_apply_task = None
+
+
+def available() -> bool:
+    return store is not None
+
+
+def _on_invalidate(place_id: Optional[int]):
+    global _reload
+    if place_id is None:
+        _reload = True
+    else:
+        _dirty.add(place_id)
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _load(conn: asyncpg.Connection):
+    global store
+    categories = await queries.fetch(conn, "snapshot.categories")
+    places = await queries.fetch(conn, "snapshot.places")
+    store = PlaceStore(categories, places)
+
+
+async def _apply_changes():
+    global _reload
+    while True:
+        await _wakeup.wait()
+        # Let a burst of writes collapse into one read
+        await asyncio.sleep(PLACE_STORE_APPLY_DELAY)
+        _wakeup.clear()
+        reload, place_ids = _reload, set(_dirty)
+        _reload = False
+        _dirty.clear()
+        try:
+            primary = await database.get_primary_pool()
+            async with primary.acquire() as conn:
+                if reload or store is None:
+                    await _load(conn)
+                else:
+                    store.apply(place_ids, await queries.fetch(conn, "store.places_by_id", list(place_ids)))
+        except Exception:
+            # Nothing was applied; retry everything next time round. Any
+            # error is caught so one bad row can't stop the store updating.
+            logger.exception("Applying place changes to the store failed")
+            _on_invalidate(None)
+            await asyncio.sleep(1)
+
+
+if PLACE_STORE_ENABLED:
+    # Subscribed from import on, so writes during the initial load are re-read after it
+    invalidation.subscribe(invalidation.PLACE, _on_invalidate)
+
+
+async def start():
+    """Load the store and start applying place invalidations (PLACE_STORE=1)."""
+    global _wakeup, _apply_task
+    if not PLACE_STORE_ENABLED or _apply_task is not None:
+        return
+    if np is None:
+        logger.warning("PLACE_STORE is set but numpy is not installed; the place store stays off")
+        return
+
+    _wakeup = asyncio.Event()
+    _on_invalidate(None)
+    _apply_task = asyncio.create_task(_apply_changes())
+
+
+async def stop():
+    global _apply_task
+    if _apply_task is not None:
+        _apply_task.cancel()
+        try:
+            await _apply_task
+        except asyncio.CancelledError:
+            pass
+        _apply_task = None
@@ -0,0 +1,836 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+import metrics
+
+# Every SQL statement the DAO modules run, by name. Each pool connection
+# prepares all of them once when it is opened (see prepare_statements), so
+# requests skip parsing and planning and this file is the one place to audit
+# what the API sends to Postgres. Modules that build SQL from fragments
+# register their fixed variants at import time.
+QUERIES: Dict[str, str] = {}
+
+
+def register(name: str, sql: str) -> str:
+    """Add a named statement to the registry and return its name."""
+    if name in QUERIES and QUERIES[name] != sql:
+        raise ValueError(f"Query {name!r} is already registered with different SQL")
+    QUERIES[name] = sql
+    return name
+
+
+def is_read_only(sql: str) -> bool:
+    """Whether a statement can be prepared on a hot standby."""
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+class RegistryConnection(asyncpg.Connection):
+    """Pool connection that keeps the prepared registry statements by name."""
+
+    __slots__ = ("statements",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements: Dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+
+
+async def prepare_statements(connection: RegistryConnection, read_only: bool = False):
+    """Pool init hook: prepare every registered statement on a new connection."""
+    for name, sql in QUERIES.items():
+        if read_only and not is_read_only(sql):
+            continue
+        connection.statements[name] = await connection.prepare(sql)
+
+
+async def prepare_read_statements(connection: RegistryConnection):
+    """Pool init hook for replicas, which can't prepare writes."""
+    await prepare_statements(connection, read_only=True)
+
+
+async def _raw_connection(conn) -> asyncpg.Connection:
+    # database.LazyConnection acquires on demand; anything else is used as-is
+    acquire = getattr(conn, "connection", None)
+    return await acquire() if acquire is not None else conn
+
+
+async def _run(conn, method_name: str, name: str, args):
+    sql = QUERIES[name]
+    connection = await _raw_connection(conn)
+    statements = getattr(connection, "statements", None)
+
+    start = time.perf_counter()
+    try:
+        if statements is None:
+            # Plain connection (scripts, the schema setup): no statement cache
+            return await getattr(connection, method_name)(sql, *args)
+        statement = statements.get(name)
+        if statement is None:
+            statement = statements[name] = await connection.prepare(sql)
+        try:
+            return await getattr(statement, method_name)(*args)
+        except (asyncpg.InvalidCachedStatementError, asyncpg.OutdatedSchemaCacheError):
+            # A migration changed a table under the plan; re-prepare once,
+            # unless we're in a transaction that the error already aborted
+            if connection.is_in_transaction():
+                raise
+            statement = statements[name] = await connection.prepare(sql)
+            return await getattr(statement, method_name)(*args)
+    finally:
+        metrics.record_query(time.perf_counter() - start, sql)
+
+
+async def fetch(conn, name: str, *args) -> List[asyncpg.Record]:
+    return await _run(conn, "fetch", name, args)
+
+
+async def fetchrow(conn, name: str, *args) -> Optional[asyncpg.Record]:
+    return await _run(conn, "fetchrow", name, args)
+
+
+async def fetchval(conn, name: str, *args) -> Any:
+    return await _run(conn, "fetchval", name, args)
+
+
+async def execute(conn, name: str, *args):
+    """Run a statement for its side effects (prepared statements have no execute())."""
+    await _run(conn, "fetch", name, args)
+
+
+# Users
+register("users.by_id", """
+    SELECT id, username, email, is_admin, created_at, updated_at
+    FROM users
+    WHERE id = $1
+""")
+
+register("users.by_email", """
+    SELECT id, username, email, password_hash, is_admin, created_at, updated_at
+    FROM users
+    WHERE email = $1
+""")
+
+register("users.by_username", """
+    SELECT id, username, email, password_hash, is_admin, created_at, updated_at
+    FROM users
+    WHERE username = $1
+""")
+
+register("users.list", """
+    SELECT id, username, email, is_admin, created_at, updated_at
+    FROM users
+    ORDER BY id
+    LIMIT $1 OFFSET $2
+""")
+
+register("users.create", """
+    INSERT INTO users (username, email, password_hash, is_admin)
+    VALUES ($1, $2, $3, $4)
+    RETURNING id, username, email, is_admin, created_at, updated_at
+""")
+
+register("users.brief", """
+    SELECT id, username
+    FROM users
+    WHERE id = $1
+""")
+
+# Categories
+register("categories.by_id", """
+    SELECT id, name, color, icon, created_at
+    FROM categories
+    WHERE id = $1
+""")
+
+register("categories.list", """
+    SELECT id, name, color, icon, created_at
+    FROM categories
+    ORDER BY name
+    LIMIT $1 OFFSET $2
+""")
+
+register("categories.create", """
+    INSERT INTO categories (name, color, icon)
+    VALUES ($1, $2, $3)
+    RETURNING id, name, color, icon, created_at
+""")
+
+register("categories.brief", """
+    SELECT id, name, color, icon
+    FROM categories
+    WHERE id = $1
+""")
+
+# Places
+register("places.by_id", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.osm_tags, p.comment_count,
+           u.username as user_username
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    WHERE p.id = $1
+""")
+
+register("places.create", """
+    INSERT INTO places (
+        name, description, latitude, longitude,
+        user_id, osm_id, is_osm_imported, osm_tags
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    RETURNING id, name, description, latitude, longitude,
+             user_id, created_at, updated_at,
+             osm_id, is_osm_imported, osm_tags
+""")
+
+register("places.add_category", """
+    INSERT INTO place_categories (place_id, category_id)
+    VALUES ($1, $2)
+    ON CONFLICT (place_id, category_id) DO NOTHING
+""")
+
+# Keep places.category_ids in step with place_categories
+register("places.sync_category_ids", """
+    UPDATE places
+    SET category_ids = COALESCE(
+        (SELECT array_agg(category_id ORDER BY category_id) FROM place_categories WHERE place_id = $1), '{}'
+    )
+    WHERE id = $1
+""")
+
+register("places.increment_comment_count", """
+    UPDATE places
+    SET comment_count = comment_count + 1
+    WHERE id = $1
+""")
+
+register("places.clear_categories", """
+    DELETE FROM place_categories
+    WHERE place_id = $1
+""")
+
+register("places.newest", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.osm_tags, p.comment_count,
+           u.username as user_username
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    ORDER BY p.created_at DESC
+    LIMIT $1
+""")
+
+register("places.top", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.osm_tags, p.comment_count,
+           u.username as user_username,
+           COUNT(l.id) as like_count
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    LEFT JOIN likes l ON p.id = l.place_id AND l.is_like = TRUE
+    GROUP BY p.id, u.username
+    ORDER BY like_count DESC, p.created_at DESC
+    LIMIT $1
+""")
+
+# get_places: one variant per filter combination
+register("places.list", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.comment_count,
+           u.username as user_username
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    ORDER BY p.created_at DESC
+    LIMIT $1 OFFSET $2
+""")
+
+# Category filters use the GIN-indexed places.category_ids array:
+# && matches any of the given ids, @> requires all of them
+register("places.list_any_categories", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.comment_count,
+           u.username as user_username
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    WHERE p.category_ids && $3::int[]
+    ORDER BY p.created_at DESC
+    LIMIT $1 OFFSET $2
+""")
+
+register("places.list_all_categories", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.comment_count,
+           u.username as user_username
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    WHERE p.category_ids @> $3::int[]
+    ORDER BY p.created_at DESC
+    LIMIT $1 OFFSET $2
+""")
+
+# Batched place reads (get_places_by_ids)
+register("places.by_ids", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.user_id, p.created_at, p.updated_at,
+           p.osm_id, p.is_osm_imported, p.comment_count,
+           u.username as user_username,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE) AS like_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE) AS dislike_count,
+           (SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id) AS favorite_count
+    FROM places p
+    LEFT JOIN users u ON p.user_id = u.id
+    WHERE p.id = ANY($1::int[])
+""")
+
+register("places.categories_for_places", """
+    SELECT pc.place_id, c.id, c.name, c.color, c.icon
+    FROM categories c
+    JOIN place_categories pc ON c.id = pc.category_id
+    WHERE pc.place_id = ANY($1::int[])
+    ORDER BY c.name
+""")
+
+register("places.counts_for_places", """
+    SELECT p.id AS place_id,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE) AS like_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE) AS dislike_count,
+           (SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id) AS favorite_count
+    FROM places p
+    WHERE p.id = ANY($1::int[])
+""")
+
+register("places.owned", """
+    SELECT id FROM places
+    WHERE id = $1 AND user_id = $2
+""")
+
+# NULL leaves a column unchanged, so one statement covers every combination
+register("places.update", """
+    UPDATE places
+    SET name = COALESCE($2, name),
+        description = COALESCE($3, description),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+""")
+
+register("places.delete", """
+    DELETE FROM places
+    WHERE id = $1
+""")
+
+# Comments
+register("comments.create", """
+    INSERT INTO comments (content, place_id, user_id)
+    VALUES ($1, $2, $3)
+    RETURNING id, content, place_id, user_id, created_at, updated_at
+""")
+
+register("comments.for_place", """
+    SELECT c.id, c.content, c.place_id, c.user_id, c.created_at, c.updated_at,
+           u.username as user_username
+    FROM comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.place_id = $1
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT $2 OFFSET $3
+""")
+
+register("comments.for_place_before", """
+    SELECT c.id, c.content, c.place_id, c.user_id, c.created_at, c.updated_at,
+           u.username as user_username
+    FROM comments c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.place_id = $1 AND (c.created_at, c.id) < ($2, $3)
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT $4
+""")
+
+# Newest comment of each place in $1, one index probe per place
+register("comments.latest_for_places", """
+    SELECT ids.place_id, c.id, left(c.content, $2) AS content, c.created_at,
+           c.user_id, u.username AS user_username
+    FROM unnest($1::int[]) AS ids(place_id)
+    CROSS JOIN LATERAL (
+        SELECT c.id, c.content, c.created_at, c.user_id
+        FROM comments c
+        WHERE c.place_id = ids.place_id
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT 1
+    ) c
+    JOIN users u ON c.user_id = u.id
+""")
+
+# Likes
+register("likes.for_user", """
+    SELECT id, place_id, user_id, is_like, created_at
+    FROM likes
+    WHERE place_id = $1 AND user_id = $2
+""")
+
+register("likes.update", """
+    UPDATE likes
+    SET is_like = $1
+    WHERE id = $2
+    RETURNING id, place_id, user_id, is_like, created_at
+""")
+
+register("likes.create", """
+    INSERT INTO likes (place_id, user_id, is_like)
+    VALUES ($1, $2, $3)
+    RETURNING id, place_id, user_id, is_like, created_at
+""")
+
+# Favorites
+register("favorites.for_user", """
+    SELECT id
+    FROM favorites
+    WHERE place_id = $1 AND user_id = $2
+""")
+
+register("favorites.delete", """
+    DELETE FROM favorites
+    WHERE id = $1
+""")
+
+register("favorites.create", """
+    INSERT INTO favorites (place_id, user_id)
+    VALUES ($1, $2)
+    RETURNING id, place_id, user_id, created_at
+""")
+
+register("favorites.places", """
+    SELECT p.id, p.name, p.description, p.latitude, p.longitude,
+           p.category_id, p.user_id, p.created_at, p.updated_at, p.comment_count,
+           c.id as category_id, c.name as category_name,
+           c.color as category_color, c.icon as category_icon,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE) AS like_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE) AS dislike_count,
+           (SELECT COUNT(*) FROM favorites fc WHERE fc.place_id = p.id) AS favorite_count
+    FROM places p
+    JOIN favorites f ON p.id = f.place_id
+    LEFT JOIN categories c ON p.category_id = c.id
+    WHERE f.user_id = $1
+    ORDER BY f.created_at DESC
+""")
+
+# Viewer state for a batch of places
+register("viewer.state", """
+    SELECT p.id AS place_id,
+           l.is_like AS viewer_like,
+           f.id IS NOT NULL AS viewer_favorited
+    FROM places p
+    LEFT JOIN likes l ON l.place_id = p.id AND l.user_id = $1
+    LEFT JOIN favorites f ON f.place_id = p.id AND f.user_id = $1
+    WHERE p.id = ANY($2::int[])
+""")
+
+# Change log (delta sync)
+# Clients page by the writer's transaction id, not by version. A sequence
+# value is taken before commit, so a lower version can become visible after
+# a higher one, but every transaction older than the snapshot's xmin has
+# finished. Reading only below that watermark means a change never commits
+# behind a cursor, so writers need no lock to serialise their commits.
+register("changes.record", """
+    INSERT INTO change_log (kind, place_id)
+    VALUES ($1, $2)
+""")
+
+# The page ends at a transaction boundary, so a cursor never splits one
+register("changes.since", """
+    WITH page AS (
+        SELECT txid
+        FROM change_log
+        WHERE txid > $1
+          AND txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        ORDER BY txid
+        LIMIT $2
+    )
+    SELECT place_id,
+           MAX(txid) AS version,
+           COUNT(*) AS change_count,
+           bool_or(kind = 'place') AS place_changed
+    FROM change_log
+    WHERE txid > $1
+      AND txid <= (SELECT MAX(txid) FROM page)
+    GROUP BY place_id
+""")
+
+# current_version is the newest change below the watermark. It never drops
+# below the horizon, even when expiry has deleted the newest rows, so it
+# only moves forwards
+register("changes.bounds", """
+    SELECT h.version AS horizon,
+           GREATEST(h.version, (
+               SELECT COALESCE(MAX(txid), 0)
+               FROM change_log
+               WHERE txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+           )) AS current_version
+    FROM sync_horizon h
+    WHERE h.id = 1
+""")
+
+register("changes.counters", """
+    SELECT p.id, p.comment_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE) AS like_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE) AS dislike_count,
+           (SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id) AS favorite_count
+    FROM places p
+    WHERE p.id = ANY($1::int[])
+""")
+
+register("advisory.try_xact_lock", """
+    SELECT pg_try_advisory_xact_lock($1)
+""")
+
+# Session-level locks for jobs.py; held across the job's transactions
+register("advisory.try_lock", """
+    SELECT pg_try_advisory_lock($1)
+""")
+
+register("advisory.unlock", """
+    SELECT pg_advisory_unlock($1)
+""")
+
+# A newer 'place' change covers everything before it; a newer 'counts'
+# change covers older 'counts' changes. Newer means a later transaction,
+# since that is the order clients read them in
+register("changes.compact_superseded", """
+    DELETE FROM change_log c
+    USING change_log n
+    WHERE n.place_id = c.place_id
+      AND (n.txid, n.version) > (c.txid, c.version)
+      AND (n.kind = 'place' OR n.kind = c.kind)
+""")
+
+register("changes.expire_tombstones", """
+    WITH expired AS (
+        DELETE FROM change_log c
+        WHERE c.changed_at < CURRENT_TIMESTAMP - $1::interval
+          AND c.txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+          AND NOT EXISTS (SELECT 1 FROM places p WHERE p.id = c.place_id)
+        RETURNING c.txid
+    )
+    UPDATE sync_horizon
+    SET version = GREATEST(version, (SELECT MAX(txid) FROM expired))
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM expired)
+""")
+
+# Binary place snapshot (snapshot.py)
+register("snapshot.categories", """
+    SELECT id, name FROM categories ORDER BY id
+""")
+
+register("snapshot.places", """
+    SELECT p.id, p.name, p.latitude, p.longitude, p.created_at,
+           COALESCE(l.like_count, 0) AS like_count,
+           COALESCE(l.dislike_count, 0) AS dislike_count,
+           COALESCE(f.favorite_count, 0) AS favorite_count,
+           p.category_ids
+    FROM places p
+    LEFT JOIN (
+        SELECT place_id,
+               COUNT(*) FILTER (WHERE is_like) AS like_count,
+               COUNT(*) FILTER (WHERE NOT is_like) AS dislike_count
+        FROM likes
+        GROUP BY place_id
+    ) l ON l.place_id = p.id
+    LEFT JOIN (
+        SELECT place_id, COUNT(*) AS favorite_count
+        FROM favorites
+        GROUP BY place_id
+    ) f ON f.place_id = p.id
+    ORDER BY p.id
+""")
+
+# In-process place store (placestore.py): same columns as snapshot.places
+register("store.places_by_id", """
+    SELECT p.id, p.name, p.latitude, p.longitude, p.created_at,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE) AS like_count,
+           (SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = FALSE) AS dislike_count,
+           (SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id) AS favorite_count,
+           p.category_ids
+    FROM places p
+    WHERE p.id = ANY($1::int[])
+""")
+
+# Heatmap binning when the place store is off (heatmap.py). $1/$2 are the
+# grid's south/west corner, $3 the cell size in degrees, $4/$5 the row and
+# column counts.
+register("heatmap.cells", """
+    SELECT LEAST(floor((p.latitude - $1::float8) / $3::float8)::int, $4::int - 1) AS row,
+           LEAST(floor((p.longitude - $2::float8) / $3::float8)::int, $5::int - 1) AS col,
+           COUNT(*) AS count,
+           SUM((SELECT COUNT(*) FROM likes l WHERE l.place_id = p.id AND l.is_like = TRUE)) AS likes,
+           SUM((SELECT COUNT(*) FROM favorites f WHERE f.place_id = p.id)) AS favorites
+    FROM places p
+    WHERE p.latitude >= $1::float8 AND p.latitude <= $1::float8 + $3::float8 * $4::int
+      AND p.longitude >= $2::float8 AND p.longitude <= $2::float8 + $3::float8 * $5::int
+    GROUP BY 1, 2
+""")
+
+# Engagement activity buckets (activity.py)
+register("activity.record", """
+    INSERT INTO place_activity (granularity, place_id, bucket, likes, dislikes, favorites, comments)
+    VALUES ('h', $1, date_trunc('hour', CURRENT_TIMESTAMP), $2, $3, $4, $5),
+           ('d', $1, date_trunc('day', CURRENT_TIMESTAMP), $2, $3, $4, $5)
+    ON CONFLICT (granularity, place_id, bucket) DO UPDATE
+    SET likes = place_activity.likes + EXCLUDED.likes,
+        dislikes = place_activity.dislikes + EXCLUDED.dislikes,
+        favorites = place_activity.favorites + EXCLUDED.favorites,
+        comments = place_activity.comments + EXCLUDED.comments
+""")
+
+# $1 granularity, $2 its date_trunc unit, $3 window, $4 limit
+register("activity.hot", """
+    SELECT p.id, p.name, p.latitude, p.longitude, p.category_ids,
+           a.likes, a.dislikes, a.favorites, a.comments, a.score
+    FROM (
+        SELECT place_id,
+               SUM(likes) AS likes,
+               SUM(dislikes) AS dislikes,
+               SUM(favorites) AS favorites,
+               SUM(comments) AS comments,
+               SUM(likes + 2 * favorites + comments - dislikes) AS score
+        FROM place_activity
+        WHERE granularity = $1
+          AND bucket >= date_trunc($2, CURRENT_TIMESTAMP - $3::interval)
+        GROUP BY place_id
+    ) a
+    JOIN places p ON p.id = a.place_id
+    WHERE a.score > 0
+    ORDER BY a.score DESC, p.id
+    LIMIT $4
+""")
+
+# $1 place, $2 granularity, $3 its date_trunc unit, $4 points, $5 bucket width
+register("activity.series", """
+    SELECT s.bucket,
+           COALESCE(a.likes, 0) AS likes,
+           COALESCE(a.dislikes, 0) AS dislikes,
+           COALESCE(a.favorites, 0) AS favorites,
+           COALESCE(a.comments, 0) AS comments
+    FROM generate_series(
+        date_trunc($3, CURRENT_TIMESTAMP) - ($4::int - 1) * $5::interval,
+        date_trunc($3, CURRENT_TIMESTAMP),
+        $5::interval
+    ) AS s(bucket)
+    LEFT JOIN place_activity a
+        ON a.granularity = $2 AND a.place_id = $1 AND a.bucket = s.bucket
+    ORDER BY s.bucket
+""")
+
+register("activity.prune", """
+    DELETE FROM place_activity
+    WHERE (granularity = 'h' AND bucket < CURRENT_TIMESTAMP - $1::interval)
+       OR (granularity = 'd' AND bucket < CURRENT_TIMESTAMP - $2::interval)
+""")
+
+# For-you feed affinities (foryou.py)
+register("affinity.enqueue", """
+    INSERT INTO affinity_queue (user_id) VALUES ($1)
+    ON CONFLICT (user_id) DO NOTHING
+""")
+
+register("affinity.dequeue", """
+    DELETE FROM affinity_queue
+    WHERE user_id IN (
+        SELECT user_id FROM affinity_queue
+        ORDER BY queued_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING user_id
+""")
+
+# Likes count 1, favorites 2 and created places 1.5. Dislikes count 0: they
+# add nothing to the affinity but still exclude the place from the feed.
+register("affinity.recompute", """
+    INSERT INTO user_affinity (user_id, category_ids, weights, latitude, longitude, place_ids, computed_at)
+    WITH engagement AS (
+        SELECT l.user_id, l.place_id, CASE WHEN l.is_like THEN 1.0 ELSE 0.0 END AS weight
+        FROM likes l WHERE l.user_id = ANY($1::int[])
+        UNION ALL
+        SELECT f.user_id, f.place_id, 2.0 FROM favorites f WHERE f.user_id = ANY($1::int[])
+        UNION ALL
+        SELECT p.user_id, p.id, 1.5 FROM places p WHERE p.user_id = ANY($1::int[])
+    ),
+    category_weights AS (
+        SELECT e.user_id, c.category_id, SUM(e.weight) AS weight
+        FROM engagement e
+        JOIN places p ON p.id = e.place_id
+        CROSS JOIN LATERAL unnest(p.category_ids) AS c(category_id)
+        WHERE e.weight > 0
+        GROUP BY e.user_id, c.category_id
+    ),
+    shares AS (
+        SELECT user_id, category_id, weight / SUM(weight) OVER (PARTITION BY user_id) AS share
+        FROM category_weights
+    ),
+    vectors AS (
+        SELECT user_id,
+               array_agg(category_id ORDER BY category_id) AS category_ids,
+               array_agg(share::real ORDER BY category_id) AS weights
+        FROM shares
+        GROUP BY user_id
+    ),
+    centers AS (
+        SELECT e.user_id,
+               (SUM(e.weight * p.latitude) / NULLIF(SUM(e.weight), 0))::float8 AS latitude,
+               (SUM(e.weight * p.longitude) / NULLIF(SUM(e.weight), 0))::float8 AS longitude,
+               array_agg(DISTINCT e.place_id) AS place_ids
+        FROM engagement e
+        JOIN places p ON p.id = e.place_id
+        GROUP BY e.user_id
+    )
+    SELECT u.id, COALESCE(v.category_ids, '{}'), COALESCE(v.weights, '{}'),
+           c.latitude, c.longitude, COALESCE(c.place_ids, '{}'), CURRENT_TIMESTAMP
+    FROM users u
+    LEFT JOIN vectors v ON v.user_id = u.id
+    LEFT JOIN centers c ON c.user_id = u.id
+    WHERE u.id = ANY($1::int[])
+    ON CONFLICT (user_id) DO UPDATE
+    SET category_ids = EXCLUDED.category_ids,
+        weights = EXCLUDED.weights,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        place_ids = EXCLUDED.place_ids,
+        computed_at = EXCLUDED.computed_at
+""")
+
+register("affinity.for_user", """
+    SELECT category_ids, weights, latitude, longitude, place_ids
+    FROM user_affinity
+    WHERE user_id = $1
+""")
+
+# The for-you score (see foryou.score) of every place for user $1, for
+# when the place store is off. Without an affinity row only freshness counts.
+register("affinity.ranked", """
+    SELECT p.id, s.score
+    FROM places p
+    LEFT JOIN user_affinity a ON a.user_id = $1
+    CROSS JOIN LATERAL (
+        SELECT $7::float8 * power(0.5, GREATEST(EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - p.created_at)::float8, 0) / $8::float8)
+             + $3::float8 * COALESCE((
+                   SELECT SUM(w.weight)
+                   FROM unnest(a.category_ids, a.weights) AS w(category_id, weight)
+                   WHERE w.category_id = ANY(p.category_ids)
+               ), 0)
+             + CASE WHEN a.latitude IS NULL THEN 0 ELSE $4::float8 * exp(-6371000 * sqrt(
+                   (radians(p.longitude::float8 - a.longitude) * cos(radians(a.latitude))) ^ 2
+                   + radians(p.latitude::float8 - a.latitude) ^ 2
+               ) / $5::float8) END AS score
+    ) s
+    WHERE a.place_ids IS NULL OR NOT p.id = ANY(a.place_ids)
+    ORDER BY s.score DESC NULLS LAST, p.id
+    LIMIT $2
+""")
+
+# Similar places (similar.py)
+register("similar.enqueue", """
+    INSERT INTO neighbor_queue (place_id) VALUES ($1)
+    ON CONFLICT (place_id) DO NOTHING
+""")
+
+# Places never computed, or computed more than $1 ago
+register("similar.enqueue_stale", """
+    INSERT INTO neighbor_queue (place_id)
+    SELECT p.id
+    FROM places p
+    LEFT JOIN place_neighbors n ON n.place_id = p.id
+    WHERE n.place_id IS NULL OR n.computed_at < CURRENT_TIMESTAMP - $1::interval
+    ORDER BY n.computed_at NULLS FIRST
+    LIMIT $2
+    ON CONFLICT (place_id) DO NOTHING
+""")
+
+register("similar.dequeue", """
+    DELETE FROM neighbor_queue
+    WHERE place_id IN (
+        SELECT place_id FROM neighbor_queue
+        ORDER BY queued_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING place_id
+""")
+
+# One sparse row of the co-occurrence matrix per place in $1: the places
+# liked or favorited by the same users, with how many users they share and
+# how many engage with each side. At most $2 per place, most shared first.
+register("similar.co_engagement", """
+    WITH engaged AS (
+        SELECT place_id, user_id FROM likes WHERE place_id = ANY($1::int[]) AND is_like
+        UNION
+        SELECT place_id, user_id FROM favorites WHERE place_id = ANY($1::int[])
+    ),
+    co AS (
+        SELECT e.place_id, o.place_id AS other_id, COUNT(*) AS users
+        FROM engaged e
+        CROSS JOIN LATERAL (
+            SELECT l.place_id FROM likes l WHERE l.user_id = e.user_id AND l.is_like
+            UNION
+            SELECT f.place_id FROM favorites f WHERE f.user_id = e.user_id
+        ) o
+        WHERE o.place_id <> e.place_id
+        GROUP BY e.place_id, o.place_id
+    ),
+    ranked AS (
+        SELECT co.*, row_number() OVER (PARTITION BY co.place_id ORDER BY co.users DESC, co.other_id) AS rank
+        FROM co
+    )
+    SELECT r.place_id, r.other_id, r.users,
+           (SELECT COUNT(*) FROM engaged e WHERE e.place_id = r.place_id) AS place_users,
+           (SELECT COUNT(*) FROM (
+                SELECT user_id FROM likes WHERE place_id = r.other_id AND is_like
+                UNION
+                SELECT user_id FROM favorites WHERE place_id = r.other_id
+            ) u) AS other_users
+    FROM ranked r
+    WHERE r.rank <= $2
+""")
+
+# Places sharing a category within $2 degrees of latitude (and the
+# matching east-west distance), nearest first, at most $3 per place
+register("similar.category_candidates", """
+    SELECT p.id AS place_id, o.id AS other_id
+    FROM places p
+    CROSS JOIN LATERAL (
+        SELECT o.id
+        FROM places o
+        WHERE o.category_ids && p.category_ids
+          AND o.id <> p.id
+          AND o.latitude BETWEEN p.latitude - $2 AND p.latitude + $2
+          AND o.longitude BETWEEN p.longitude - $2 / cos(radians(p.latitude::float8))
+                              AND p.longitude + $2 / cos(radians(p.latitude::float8))
+        ORDER BY (o.latitude - p.latitude) ^ 2 + (o.longitude - p.longitude) ^ 2
+        LIMIT $3
+    ) o
+    WHERE p.id = ANY($1::int[])
+""")
+
+register("similar.features", """
+    SELECT id, latitude::float8 AS latitude, longitude::float8 AS longitude, category_ids
+    FROM places
+    WHERE id = ANY($1::int[])
+""")
+
+register("similar.store", """
+    INSERT INTO place_neighbors (place_id, neighbor_ids, scores, computed_at)
+    VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+    ON CONFLICT (place_id) DO UPDATE
+    SET neighbor_ids = EXCLUDED.neighbor_ids,
+        scores = EXCLUDED.scores,
+        computed_at = EXCLUDED.computed_at
+""")
+
+register("similar.for_place", """
+    SELECT neighbor_ids[1:$2] AS neighbor_ids, scores[1:$2] AS scores
+    FROM place_neighbors
+    WHERE place_id = $1
+""")
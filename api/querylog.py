@@ -0,0 +1,69 @@
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+import metrics
+
+logger = logging.getLogger("uwi.querylog")
+
+# Opt-in: set DB_QUERY_LOG=1 (e.g. in staging) to record every statement
+QUERY_LOG_ENABLED = os.getenv("DB_QUERY_LOG", "").lower() in ("1", "true", "yes")
+
+# Statements slower than this are logged with the route that issued them
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# Requests issuing more statements than this are flagged
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+
+# A fingerprint repeated this often in one request is reported as a likely N+1
+REPEAT_THRESHOLD = 3
+
+SLOW_QUERIES = metrics.Counter("app_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("route",))
+BUDGET_EXCEEDED = metrics.Counter("app_db_query_budget_exceeded_total", "Requests issuing more than QUERY_BUDGET statements.", ("route",))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """Normalize a statement so the same query shape always maps to one key.
+
+    Literals become ``?``, literal lists collapse to ``(?+)`` and whitespace
+    is squeezed. Bind parameters ($1, $2, ...) are left as they are.
+    """
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(?+)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def check_request(route: str, stats: metrics.RequestStats):
+    """Log slow statements and requests that blow the query budget."""
+    for query, duration in stats.statements:
+        duration_ms = duration * 1000
+        if duration_ms >= SLOW_QUERY_MS:
+            SLOW_QUERIES.inc(route=route)
+            logger.warning("slow query %.1f ms on %s: %s", duration_ms, route, fingerprint(query))
+
+    if stats.queries > QUERY_BUDGET:
+        BUDGET_EXCEEDED.inc(route=route)
+        repeated = Counter(fingerprint(query) for query, _ in stats.statements)
+        suspects = [(shape, count) for shape, count in repeated.most_common() if count >= REPEAT_THRESHOLD]
+        logger.warning(
+            "%s ran %d queries (budget %d, %.1f ms in DB)%s",
+            route,
+            stats.queries,
+            QUERY_BUDGET,
+            stats.db_time * 1000,
+            "".join(f"\n  possible N+1, {count}x: {shape}" for shape, count in suspects),
+        )
+
+
+def enable():
+    """Start checking every request. Called at startup when DB_QUERY_LOG is set."""
+    metrics.add_request_observer(check_request)
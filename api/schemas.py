@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, constr, validator, field_validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
 # Base schemas
@@ -41,22 +41,42 @@ class PlaceUpdate(BaseModel):
     description: Optional[str] = None
     category_ids: Optional[List[int]] = None  # Changed from category_id
 
+class CategoryBrief(CategoryBase):
+    id: int
+
+class UserBrief(BaseModel):
+    id: int
+    username: str
+
+class CommentPreview(BaseModel):
+    id: int
+    content: str  # the first interactions.COMMENT_SNIPPET_LENGTH characters
+    created_at: datetime
+    user: UserBrief
+
 class Place(BaseModel):
     id: int
     user_id: int
+    user_username: Optional[str] = None
     name: str
     description: str
     latitude: float
     longitude: float
     created_at: datetime
     updated_at: datetime
-    categories: List[CategoryBase] = []  # Changed from category to categories list
+    categories: List[CategoryBrief] = []  # Changed from category to categories list
     like_count: Optional[int] = 0
     dislike_count: Optional[int] = 0
     favorite_count: Optional[int] = 0
     osm_id: Optional[str] = None
     is_osm_imported: Optional[bool] = False
     osm_tags: Optional[Dict[str, Any]] = None
+    comment_count: int = 0
+    # Only present when requested with last_comment=true
+    last_comment: Optional[CommentPreview] = None
+    # Only present when the request is authenticated
+    viewer_like: Optional[bool] = None
+    viewer_favorited: Optional[bool] = None
 
     class Config:
         from_attributes = True
@@ -94,7 +114,8 @@ class Comment(CommentBase):
     place_id: int
     user_id: int
     created_at: datetime
-    user: Optional[User] = None
+    updated_at: Optional[datetime] = None
+    user: Optional[UserBrief] = None
 
     class Config:
         from_attributes = True
@@ -119,10 +140,93 @@ class Favorite(BaseModel):
 
 class PlaceDetail(Place):
     comments: List[Comment] = []
+    comments_next_cursor: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+class ScoredPlace(Place):
+    score: Optional[float] = None
+
+class FavoritePlace(BaseModel):
+    id: int
+    user_id: int
+    name: str
+    description: str
+    latitude: float
+    longitude: float
+    created_at: datetime
+    updated_at: datetime
+    category_id: Optional[int] = None
+    category: Optional[CategoryBrief] = None
+    like_count: int = 0
+    dislike_count: int = 0
+    favorite_count: int = 0
+    comment_count: int = 0
+    last_comment: Optional[CommentPreview] = None
+    viewer_like: Optional[bool] = None
+    viewer_favorited: Optional[bool] = None
+
+class MapPlace(BaseModel):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    category_ids: List[int] = []
+    like_count: int = 0
+    dislike_count: int = 0
+    favorite_count: int = 0
+    created_at: datetime
+    # Only present in /api/map/nearby results
+    distance_m: Optional[float] = None
+
+class HotPlace(BaseModel):
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+    category_ids: List[int] = []
+    likes: int
+    dislikes: int
+    favorites: int
+    comments: int
+    score: int
+
+class ActivityBucket(BaseModel):
+    bucket: datetime
+    likes: int
+    dislikes: int
+    favorites: int
+    comments: int
+
+class Heatmap(BaseModel):
+    south: float
+    west: float
+    north: float
+    east: float
+    cell_size: float
+    rows: int
+    cols: int
+    weight: str
+    max: float
+    # [row, col, value]
+    cells: List[Tuple[int, int, float]] = []
+
+class PlaceCounters(BaseModel):
+    id: int
+    like_count: int
+    dislike_count: int
+    favorite_count: int
+    comment_count: int
+
+class SyncResponse(BaseModel):
+    version: int
+    reset: bool
+    has_more: bool
+    places: List[Place] = []
+    deleted: List[int] = []
+    counters: List[PlaceCounters] = []
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
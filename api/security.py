@@ -7,7 +7,8 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 
-from database import get_db
+import queries
+from database import get_db, get_read_db
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "YOUR_SECRET_KEY_HERE")  # In production, use env variable
@@ -20,6 +21,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
+# Same scheme for endpoints that also serve anonymous users
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token", auto_error=False)
+
 # Password verification and hashing
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -39,14 +43,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_user_by_username(conn: asyncpg.Connection, username: str) -> Optional[Dict[str, Any]]:
     """Get a user by username from the database."""
-    user = await conn.fetchrow(
-        """
-        SELECT id, username, email, password_hash, is_admin, created_at, updated_at
-        FROM users
-        WHERE username = $1
-        """,
-        username
-    )
+    user = await queries.fetchrow(conn, "users.by_username", username)
     return dict(user) if user else None
 
 async def get_current_user(token: str = Depends(oauth2_scheme), conn: asyncpg.Connection = Depends(get_db)):
@@ -69,4 +66,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), conn: asyncpg.Co
     if user is None:
         raise credentials_exception
     
-    return user
\ No newline at end of file
+    return user
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    conn: asyncpg.Connection = Depends(get_read_db)
+) -> Optional[Dict[str, Any]]:
+    """Get the current user if a valid token was sent, otherwise None."""
+    if not token:
+        return None
+    
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    
+    username = payload.get("sub")
+    if username is None:
+        return None
+    
+    return await get_user_by_username(conn, username)
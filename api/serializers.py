@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Callable, Dict
+
+from pydantic import TypeAdapter
+from pydantic_core import SchemaSerializer, core_schema
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+import database
+
+# Response encoding without validation.
+#
+# Endpoints return dicts built from our own database rows. With a
+# response_model, FastAPI would validate each one into a model and then
+# serialize the copy. Instead every response_model is compiled once into a
+# pydantic-core serializer that reads the dicts directly and writes JSON
+# bytes, keeping only the declared fields (nested ones too). Keys missing
+# from a dict are left out rather than filled with their defaults.
+
+_serializers: Dict[Any, SchemaSerializer] = {}
+
+
+def _dict_schema(schema: Any) -> Any:
+    """Rewrite a core schema so each model in it serializes from a plain dict."""
+    if isinstance(schema, list):
+        return [_dict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    if schema.get("type") == "model":
+        fields = {
+            name: core_schema.typed_dict_field(
+                _dict_schema(field["schema"]), required=field["schema"]["type"] != "default"
+            )
+            for name, field in schema["schema"]["fields"].items()
+        }
+        return core_schema.typed_dict_schema(fields, ref=schema.get("ref"))
+    return {key: _dict_schema(value) for key, value in schema.items()}
+
+
+def serializer(response_model: Any) -> SchemaSerializer:
+    """The compiled serializer for a response model type, e.g. List[schemas.Place]."""
+    compiled = _serializers.get(response_model)
+    if compiled is None:
+        schema = _dict_schema(TypeAdapter(response_model).core_schema)
+        compiled = _serializers[response_model] = SchemaSerializer(schema)
+    return compiled
+
+
+def dump_json(response_model: Any, content: Any) -> bytes:
+    # Without warnings: osm_tags comes back from asyncpg as JSON text, not a
+    # dict, and is passed through as a string as before
+    return serializer(response_model).to_json(content, warnings=False)
+
+
+class TypedRoute(database.ReleasingRoute):
+    """Route that encodes results with its response_model's compiled serializer.
+
+    The response_model still documents the endpoint in OpenAPI. Endpoints
+    that return a Response (JSON text from Postgres, binary snapshots) are
+    passed through untouched.
+    """
+
+    def get_route_handler(self) -> Callable:
+        if self.response_model is not None:
+            self.dependant.call = self._encode_results(self.dependant.call)
+        return super().get_route_handler()
+
+    def _encode_results(self, endpoint: Callable) -> Callable:
+        encode = serializer(self.response_model)
+        response_param = self.dependant.response_param_name
+        status_code = self.status_code or 200
+        is_coroutine = asyncio.iscoroutinefunction(endpoint)
+
+        async def call(**values):
+            if is_coroutine:
+                content = await endpoint(**values)
+            else:
+                content = await run_in_threadpool(endpoint, **values)
+            if isinstance(content, Response):
+                return content
+
+            response = Response(encode.to_json(content, warnings=False), status_code, media_type="application/json")
+            # Headers and status set on an injected `response: Response`
+            sub_response = values.get(response_param) if response_param else None
+            if sub_response is not None:
+                if sub_response.status_code:
+                    response.status_code = sub_response.status_code
+                response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        return call
@@ -0,0 +1,100 @@
+"""Production launcher: migrate once, then run N uvicorn worker processes.
+
+    python serve.py            # one worker per CPU
+    WORKERS=4 DB_MAX_CONNECTIONS=60 python serve.py
+
+DB_MAX_CONNECTIONS is the total Postgres connection budget for this API
+box. Each worker's share of it, less the connections the worker opens
+outside its pool, becomes that worker's pool size. Without WORKERS, the
+worker count is capped so the budget is never exceeded; an explicit
+WORKERS that doesn't fit is an error.
+"""
+import asyncio
+import glob
+import os
+import tempfile
+
+import uvicorn
+
+# Total connections all workers together may open to the primary (and to
+# each replica, whose pools are sized the same)
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+
+# Connections each worker holds outside its pool: the invalidation
+# listener on the primary, or the health probe on each replica
+DEDICATED_CONNECTIONS = 1
+
+# Background jobs run on pool connections and a locked job keeps its
+# connection for the whole run, so the pool needs this many on top of
+# the ones left for requests
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+MIN_REQUEST_CONNECTIONS = 2
+MIN_POOL_SIZE = JOB_CONCURRENCY + MIN_REQUEST_CONNECTIONS
+
+# Connections kept open per worker even when idle
+IDLE_POOL_SIZE = 2
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8888"))
+
+
+def max_workers() -> int:
+    """Most workers whose pools and dedicated connections fit the budget."""
+    return DB_MAX_CONNECTIONS // (MIN_POOL_SIZE + DEDICATED_CONNECTIONS)
+
+
+def worker_count() -> int:
+    limit = max_workers()
+    if limit < 1:
+        raise SystemExit(
+            f"DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS} is below the "
+            f"{MIN_POOL_SIZE + DEDICATED_CONNECTIONS} connections one worker needs"
+        )
+    requested = int(os.getenv("WORKERS", "0"))
+    if requested > limit:
+        raise SystemExit(
+            f"WORKERS={requested} would exceed DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}; "
+            f"at most {limit} workers fit"
+        )
+    return requested or min(os.cpu_count() or 1, limit)
+
+
+def configure_pools(workers: int):
+    """Split the connection budget across workers via the env they inherit."""
+    max_size = DB_MAX_CONNECTIONS // workers - DEDICATED_CONNECTIONS
+    os.environ["DB_POOL_MAX_SIZE"] = str(max_size)
+    os.environ["DB_POOL_MIN_SIZE"] = str(min(IDLE_POOL_SIZE, max_size))
+
+
+def configure_metrics():
+    """Give the workers a shared, empty directory to merge /metrics through."""
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
+    else:
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="uwi-metrics-")
+
+
+async def migrate():
+    # Imported here so the module reads the pool size configured above
+    import database
+
+    await database.initialize_db()
+    await database.close_db_connection()
+
+
+def main():
+    workers = worker_count()
+    configure_pools(workers)
+    configure_metrics()
+
+    # Run schema setup once here instead of in every worker's startup
+    asyncio.run(migrate())
+    os.environ["DB_SKIP_INITIALIZE"] = "1"
+
+    uvicorn.run("main:app", host=HOST, port=PORT, workers=workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import math
+import os
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List
+
+import asyncpg
+
+import jobs
+import placestore
+import queries
+
+# "People who liked this also liked". For each place, a ranked list of its
+# SIMILAR_NEIGHBORS most similar places is kept in place_neighbors, so a
+# request reads one row and slices it. Lists are rebuilt in the background:
+# a like or favorite queues the place, and lists older than
+# SIMILAR_MAX_AGE are requeued so the places on the other side of a new
+# co-engagement catch up too.
+#
+# Candidates are the place's row of the (sparse) co-occurrence matrix,
+# computed in Postgres from the likes and favorites of the users who
+# engaged with it, plus nearby places sharing a category, so places
+# without engagement still get neighbors.
+
+# Score = CO_ENGAGEMENT * shared users / sqrt(users of each place)
+#       + CATEGORY * category overlap (Jaccard)
+#       + DISTANCE * exp(-distance / SIMILAR_DISTANCE_SCALE_M)
+SIMILAR_WEIGHTS = {
+    "co_engagement": float(os.getenv("SIMILAR_CO_ENGAGEMENT_WEIGHT", "1.0")),
+    "category": float(os.getenv("SIMILAR_CATEGORY_WEIGHT", "0.5")),
+    "distance": float(os.getenv("SIMILAR_DISTANCE_WEIGHT", "0.3")),
+}
+SIMILAR_DISTANCE_SCALE_M = float(os.getenv("SIMILAR_DISTANCE_SCALE_M", "1000"))
+
+# Neighbors kept per place, and candidates of each kind scored for it
+SIMILAR_NEIGHBORS = int(os.getenv("SIMILAR_NEIGHBORS", "50"))
+SIMILAR_CANDIDATES = int(os.getenv("SIMILAR_CANDIDATES", "200"))
+
+# How far away same-category candidates are looked for
+SIMILAR_RADIUS_M = float(os.getenv("SIMILAR_RADIUS_M", "5000"))
+
+# Seconds between refreshes, places rebuilt per transaction, and how old a
+# list gets before it is rebuilt anyway (at most SIMILAR_BATCH_SIZE * 10
+# requeued per refresh)
+SIMILAR_REFRESH_INTERVAL = float(os.getenv("SIMILAR_REFRESH_INTERVAL", "60"))
+SIMILAR_BATCH_SIZE = int(os.getenv("SIMILAR_BATCH_SIZE", "100"))
+SIMILAR_MAX_AGE = timedelta(days=int(os.getenv("SIMILAR_MAX_AGE_DAYS", "7")))
+
+SIMILAR_LOCK = 0x75770005
+
+
+async def mark_stale(conn: asyncpg.Connection, place_id: int):
+    """Queue a place's neighbor list for rebuilding after its likes,
+    favorites or categories change."""
+    await queries.execute(conn, "similar.enqueue", place_id)
+
+
+def _distance(a: asyncpg.Record, b: asyncpg.Record) -> float:
+    x = math.radians(b["longitude"] - a["longitude"]) * math.cos(math.radians(a["latitude"]))
+    y = math.radians(b["latitude"] - a["latitude"])
+    return placestore.EARTH_RADIUS_M * math.sqrt(x * x + y * y)
+
+
+def _jaccard(a: List[int], b: List[int]) -> float:
+    union = len(set(a) | set(b))
+    return len(set(a) & set(b)) / union if union else 0.0
+
+
+async def rebuild(conn: asyncpg.Connection, place_ids: List[int]):
+    """Score the candidates of each place and store its best neighbors."""
+    candidates: Dict[int, Dict[int, float]] = defaultdict(dict)
+    for row in await queries.fetch(conn, "similar.co_engagement", place_ids, SIMILAR_CANDIDATES):
+        candidates[row["place_id"]][row["other_id"]] = row["users"] / math.sqrt(row["place_users"] * row["other_users"])
+    radius = math.degrees(SIMILAR_RADIUS_M / placestore.EARTH_RADIUS_M)
+    for row in await queries.fetch(conn, "similar.category_candidates", place_ids, radius, SIMILAR_CANDIDATES):
+        candidates[row["place_id"]].setdefault(row["other_id"], 0.0)
+
+    feature_ids = set(place_ids)
+    for others in candidates.values():
+        feature_ids.update(others)
+    features = {row["id"]: row for row in await queries.fetch(conn, "similar.features", list(feature_ids))}
+
+    for place_id in place_ids:
+        place = features.get(place_id)
+        if place is None:
+            # Deleted since it was queued
+            continue
+        scored = []
+        for other_id, co_engagement in candidates[place_id].items():
+            other = features.get(other_id)
+            if other is None:
+                continue
+            score = (
+                SIMILAR_WEIGHTS["co_engagement"] * co_engagement
+                + SIMILAR_WEIGHTS["category"] * _jaccard(place["category_ids"], other["category_ids"])
+                + SIMILAR_WEIGHTS["distance"] * math.exp(-_distance(place, other) / SIMILAR_DISTANCE_SCALE_M)
+            )
+            scored.append((score, other_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        scored = scored[:SIMILAR_NEIGHBORS]
+        await queries.execute(
+            conn, "similar.store", place_id, [other_id for _, other_id in scored], [score for score, _ in scored]
+        )
+
+
+async def refresh(conn: asyncpg.Connection):
+    """Rebuild the lists of every queued place, a batch per transaction."""
+    await queries.execute(conn, "similar.enqueue_stale", SIMILAR_MAX_AGE, SIMILAR_BATCH_SIZE * 10)
+    while True:
+        async with conn.transaction():
+            rows = await queries.fetch(conn, "similar.dequeue", SIMILAR_BATCH_SIZE)
+            if rows:
+                await rebuild(conn, [row["place_id"] for row in rows])
+        if len(rows) < SIMILAR_BATCH_SIZE:
+            return
+
+
+async def get_similar(conn: asyncpg.Connection, place_id: int, limit: int = 10) -> List[Dict[str, float]]:
+    """The place's `limit` most similar places as [{"id", "score"}], best
+    first. Empty until its list is first built."""
+    row = await queries.fetchrow(conn, "similar.for_place", place_id, limit)
+    if row is None:
+        return []
+    return [{"id": neighbor_id, "score": score} for neighbor_id, score in zip(row["neighbor_ids"], row["scores"])]
+
+
+jobs.register("similar.refresh", refresh, SIMILAR_REFRESH_INTERVAL, lock=SIMILAR_LOCK)
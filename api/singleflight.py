@@ -0,0 +1,73 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import metrics
+
+# Seconds a caller waits on someone else's in-flight load before running its own
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "5"))
+
+FLIGHT_CALLS = metrics.Counter(
+    "app_single_flight_calls_total",
+    "Coalesced reads by group and outcome (leader ran the load, shared awaited it).",
+    ("group", "result"),
+)
+
+
+class SingleFlight:
+    """Coalesce concurrent identical reads into one in-flight load per key.
+
+    The first caller for a key runs the load on its own connection; callers
+    arriving while it runs await the same result (or exception) instead of
+    issuing duplicate queries. Results are shared, so callers must copy
+    before mutating them.
+    """
+
+    def __init__(self, group: str, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.group = group
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Return load()'s result, sharing it with concurrent callers for key.
+
+        A caller that waits longer than `timeout` stops waiting and runs the
+        load itself. If the leading caller is cancelled (client went away),
+        a waiting caller takes over.
+        """
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                break
+            try:
+                result = await asyncio.wait_for(asyncio.shield(call), self.timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                FLIGHT_CALLS.inc(group=self.group, result="timeout")
+                return await load()
+            except asyncio.CancelledError:
+                if call.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            FLIGHT_CALLS.inc(group=self.group, result="shared")
+            return result
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        FLIGHT_CALLS.inc(group=self.group, result="leader")
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as exc:
+            call.set_exception(exc)
+            # Retrieve it here too, so a flight nobody joined doesn't log
+            # "exception was never retrieved"
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
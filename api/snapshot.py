@@ -0,0 +1,182 @@
+import asyncio
+import gzip
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional
+
+import asyncpg
+
+import jobs
+import queries
+import singleflight
+
+# Binary snapshot of every place, for clients that want the whole map at once.
+# All integers are little-endian. Every section up to the category masks is
+# 4-byte aligned, so JS can view them directly as typed arrays.
+#
+#   header (32 bytes)
+#     magic          4s   b"UWIP"
+#     format         u16  FORMAT_VERSION
+#     mask_bytes     u16  bytes per place category mask
+#     data_version   u64  change log version; pass to /api/sync?since=
+#     place_count    u32  n
+#     category_count u32  c
+#     string_count   u32  s
+#     string_bytes   u32  length of the UTF-8 string blob
+#   category ids     i32[c]  bit i of a mask refers to category_ids[i]
+#   category names   u32[c]  string table index
+#   place ids        i32[n]  ascending
+#   latitudes        i32[n]  degrees * 1e7
+#   longitudes       i32[n]  degrees * 1e7
+#   like counts      u32[n]
+#   dislike counts   u32[n]
+#   favorite counts  u32[n]
+#   place names      u32[n]  string table index
+#   string offsets   u32[s + 1]  string i is blob[offsets[i]:offsets[i + 1]]
+#   category masks   u8[n * mask_bytes]  little-endian bit order per place
+#   string blob      UTF-8
+
+MAGIC = b"UWIP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHQIIII")
+COORDINATE_SCALE = 10_000_000
+
+# Seconds between checks of the data version
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "15"))
+
+
+class Snapshot:
+    """An encoded snapshot and its gzipped copy.
+
+    Each encoding has its own strong ETag, since the bytes differ.
+    """
+
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.etag = f'"places-{FORMAT_VERSION}-{version}"'
+        self.gzipped_etag = f'"places-{FORMAT_VERSION}-{version}-gz"'
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (q > 0 for gzip,
+    x-gzip or, if neither is listed, *)."""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison)."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+current: Optional[Snapshot] = None
+_flights = singleflight.SingleFlight("snapshot")
+
+
+def _pack(typecode: str, values) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def encode(version: int, categories: List[asyncpg.Record], places: List[asyncpg.Record]) -> bytes:
+    """Encode category and place rows into the binary snapshot format."""
+    strings: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        return strings.setdefault(value or "", len(strings))
+
+    category_ids = [category["id"] for category in categories]
+    category_names = [intern(category["name"]) for category in categories]
+    category_bits = {category_id: bit for bit, category_id in enumerate(category_ids)}
+    mask_bytes = max(1, (len(category_ids) + 7) // 8)
+
+    masks = bytearray(len(places) * mask_bytes)
+    for row, place in enumerate(places):
+        for category_id in place["category_ids"]:
+            bit = category_bits.get(category_id)
+            if bit is not None:
+                masks[row * mask_bytes + bit // 8] |= 1 << (bit % 8)
+
+    place_names = [intern(place["name"]) for place in places]
+
+    blob = bytearray()
+    offsets = [0]
+    for value in strings:
+        blob += value.encode()
+        offsets.append(len(blob))
+
+    return b"".join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, mask_bytes, version, len(places), len(categories), len(strings), len(blob)),
+        _pack("i", category_ids),
+        _pack("I", category_names),
+        _pack("i", [place["id"] for place in places]),
+        _pack("i", [round(float(place["latitude"]) * COORDINATE_SCALE) for place in places]),
+        _pack("i", [round(float(place["longitude"]) * COORDINATE_SCALE) for place in places]),
+        _pack("I", [place["like_count"] for place in places]),
+        _pack("I", [place["dislike_count"] for place in places]),
+        _pack("I", [place["favorite_count"] for place in places]),
+        _pack("I", place_names),
+        _pack("I", offsets),
+        bytes(masks),
+        bytes(blob),
+    ])
+
+
+async def get_data_version(conn: asyncpg.Connection) -> int:
+    return (await queries.fetchrow(conn, "changes.bounds"))["current_version"]
+
+
+async def build(conn: asyncpg.Connection) -> Snapshot:
+    """Read every place and encode a snapshot at one consistent data version."""
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        version = await get_data_version(conn)
+        categories = await queries.fetch(conn, "snapshot.categories")
+        places = await queries.fetch(conn, "snapshot.places")
+    # Encoding and compressing are CPU work; keep them off the event loop
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: Snapshot(version, encode(version, categories, places))
+    )
+
+
+async def refresh(conn: asyncpg.Connection) -> Snapshot:
+    """Rebuild the snapshot if the data version moved since the last build."""
+    global current
+    if current is None or await get_data_version(conn) != current.version:
+        current = await _flights.do("build", lambda: build(conn))
+    return current
+
+
+async def get_snapshot(conn: asyncpg.Connection) -> Snapshot:
+    """The latest snapshot, building it first if there is none yet."""
+    return current if current is not None else await refresh(conn)
+
+
+# Every worker serves its own copy, so each one refreshes; no lock
+jobs.register("snapshot.refresh", refresh, SNAPSHOT_REFRESH_INTERVAL, run_at_start=True)
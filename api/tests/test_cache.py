@@ -0,0 +1,68 @@
+import cache
+
+
+def test_get_returns_set_value():
+    lru = cache.LRUCache("test", 10, 60)
+    assert lru.get("a") is None
+    lru.set("a", 1)
+    assert lru.get("a") == 1
+
+
+def test_evicts_least_recently_used():
+    lru = cache.LRUCache("test", 2, 60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert len(lru) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = cache.LRUCache("test", 10, 5)
+    lru.set("a", 1)
+    now[0] = 104.9
+    assert lru.get("a") == 1
+    now[0] = 105.1
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_set_with_stale_token_is_dropped():
+    lru = cache.LRUCache("test", 10, 60)
+    token = lru.token()
+    # A write lands while the load is in flight
+    lru.invalidate("a")
+    lru.set("a", "read before the write", token)
+    assert lru.get("a") is None
+
+    lru.set("a", "fresh", lru.token())
+    assert lru.get("a") == "fresh"
+
+
+def test_invalidating_another_key_also_drops_racing_loads():
+    lru = cache.LRUCache("test", 10, 60)
+    token = lru.token()
+    lru.invalidate("b")
+    lru.set("a", 1, token)
+    assert lru.get("a") is None
+
+
+def test_set_without_token_always_stores():
+    lru = cache.LRUCache("test", 10, 60)
+    lru.invalidate()
+    lru.set("a", 1)
+    assert lru.get("a") == 1
+
+
+def test_invalidate_everything():
+    lru = cache.LRUCache("test", 10, 60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.invalidate()
+    assert len(lru) == 0
+    assert lru.get("a") is None
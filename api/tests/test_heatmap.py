@@ -0,0 +1,60 @@
+import math
+from datetime import datetime, timezone
+
+import pytest
+
+import heatmap
+import placestore
+
+
+def test_grid_is_aligned_and_covers_the_bbox():
+    grid = heatmap.Grid(18.001, -76.75, 18.02, -76.72, 64)
+    assert math.log2(grid.cell_size) == int(math.log2(grid.cell_size))
+    assert grid.south % grid.cell_size == 0
+    assert grid.west % grid.cell_size == 0
+    assert grid.south <= 18.001 and grid.north >= 18.02
+    assert grid.west <= -76.75 and grid.east >= -76.72
+    # No finer than the requested resolution over the longer side
+    assert max(18.02 - 18.001, 0.03) / grid.cell_size <= 64
+
+
+def test_nearby_viewports_share_a_grid():
+    a = heatmap.Grid(18.0, -76.75, 18.02, -76.72, 64)
+    b = heatmap.Grid(18.0001, -76.7499, 18.0201, -76.7201, 64)
+    assert a.cell_size == b.cell_size
+    assert (a.south, a.west) == (b.south, b.west)
+
+
+def test_tiny_bbox_stops_at_min_cell_size():
+    grid = heatmap.Grid(18.0, -76.7, 18.0 + 1e-9, -76.7 + 1e-9, 256)
+    assert grid.cell_size == heatmap.MIN_CELL_SIZE
+    assert grid.rows >= 1 and grid.cols >= 1
+
+
+@pytest.mark.parametrize("bbox", ["1,2,3", "a,b,c,d", "10,0,5,1", "0,10,1,5", "-91,0,0,1", "0,0,1,181"])
+def test_parse_bbox_rejects_malformed(bbox):
+    with pytest.raises(ValueError):
+        heatmap.parse_bbox(bbox)
+
+
+def test_parse_bbox():
+    assert heatmap.parse_bbox("18,-76.8,18.1,-76.7") == (18.0, -76.8, 18.1, -76.7)
+
+
+def test_from_store_bins_places_into_cells():
+    pytest.importorskip("numpy")
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    places = [
+        {"id": 1, "name": "a", "latitude": 0.1, "longitude": 0.1, "category_ids": [], "like_count": 2,
+         "dislike_count": 0, "favorite_count": 1, "created_at": now},
+        {"id": 2, "name": "b", "latitude": 0.2, "longitude": 0.2, "category_ids": [], "like_count": 3,
+         "dislike_count": 0, "favorite_count": 0, "created_at": now},
+        {"id": 3, "name": "c", "latitude": 0.9, "longitude": 0.9, "category_ids": [], "like_count": 0,
+         "dislike_count": 0, "favorite_count": 0, "created_at": now},
+    ]
+    store = placestore.PlaceStore([], places)
+    grid = heatmap.Grid(0.0, 0.0, 1.0, 1.0, 2)
+    assert grid.cell_size == 0.5
+
+    assert sorted(map(tuple, heatmap._from_store(store, grid, "count"))) == [(0, 0, 2.0), (1, 1, 1.0)]
+    assert [tuple(cell) for cell in heatmap._from_store(store, grid, "engagement")] == [(0, 0, 6.0)]
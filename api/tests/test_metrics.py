@@ -0,0 +1,42 @@
+import metrics
+
+
+def _worker(samples, live=True):
+    return metrics._WorkerSamples(samples, live)
+
+
+def test_counters_and_histograms_sum_across_workers():
+    counter = metrics.Counter("test_merge_total", "Test counter.", ("route",))
+    histogram = metrics.Histogram("test_merge_seconds", "Test histogram.", (), (0.1, 1.0))
+    workers = {
+        "1": _worker({"test_merge_total": [[["/a"], 2], [["/b"], 1]], "test_merge_seconds": [[[], [1, 0, 0.05, 1]]]}),
+        "2": _worker({"test_merge_total": [[["/a"], 3]], "test_merge_seconds": [[[], [0, 1, 0.5, 1]]]}, live=False),
+    }
+
+    assert counter.merge(workers) == {("/a",): 5, ("/b",): 1}
+    assert histogram.merge(workers) == {(): [1, 1, 0.55, 2]}
+
+
+def test_gauges_are_labelled_by_live_worker():
+    gauge = metrics.Gauge("test_merge_gauge", "Test gauge.", ("pool",))
+    workers = {
+        "1": _worker({"test_merge_gauge": [[["primary"], 4]]}),
+        "2": _worker({"test_merge_gauge": [[["primary"], 6]]}),
+        "3": _worker({"test_merge_gauge": [[["primary"], 9]]}, live=False),
+    }
+
+    lines = gauge.samples(gauge.merge(workers))
+
+    assert sorted(lines) == [
+        'test_merge_gauge{pool="primary",worker="1"} 4',
+        'test_merge_gauge{pool="primary",worker="2"} 6',
+    ]
+
+
+def test_render_merges_worker_files(tmp_path, monkeypatch):
+    counter = metrics.Counter("test_render_total", "Test counter.")
+    counter.inc(2)
+    (tmp_path / "999999.json").write_text('{"test_render_total": [[[], 3]]}')
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+
+    assert "test_render_total 5" in metrics.render().splitlines()
@@ -0,0 +1,30 @@
+import asyncio
+
+import places
+import queries
+
+
+def test_shape_places_batches_categories_and_counts(monkeypatch):
+    calls = []
+
+    async def fetch(conn, name, *args):
+        calls.append(name)
+        if name == "places.categories_for_places":
+            return [{"place_id": 2, "id": 7, "name": "Food", "color": "#f00", "icon": "food"}]
+        return [
+            {"place_id": 1, "like_count": 3, "dislike_count": 0, "favorite_count": 1},
+            {"place_id": 2, "like_count": 0, "dislike_count": 2, "favorite_count": 0},
+        ]
+
+    monkeypatch.setattr(queries, "fetch", fetch)
+    rows = [{"id": place_id, "name": f"Place {place_id}"} for place_id in (1, 2, 3)]
+
+    shaped = asyncio.run(places._shape_places(None, rows))
+
+    assert calls == ["places.categories_for_places", "places.counts_for_places"]
+    assert [place["id"] for place in shaped] == [1, 2, 3]
+    assert shaped[0]["categories"] == [] and shaped[0]["like_count"] == 3
+    assert shaped[1]["categories"] == [{"id": 7, "name": "Food", "color": "#f00", "icon": "food"}]
+    assert shaped[1]["dislike_count"] == 2
+    # Deleted before its counts were read
+    assert shaped[2]["favorite_count"] == 0
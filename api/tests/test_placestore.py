@@ -0,0 +1,102 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import placestore  # noqa: E402
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CATEGORIES = [{"id": 10, "name": "Food"}, {"id": 20, "name": "Study"}]
+
+
+def place(place_id, latitude=18.0, longitude=-76.7, category_ids=(), likes=0, age_days=0, name=None):
+    return {
+        "id": place_id,
+        "name": name or f"place {place_id}",
+        "latitude": latitude,
+        "longitude": longitude,
+        "category_ids": list(category_ids),
+        "like_count": likes,
+        "dislike_count": 0,
+        "favorite_count": 0,
+        "created_at": EPOCH - timedelta(days=age_days),
+    }
+
+
+@pytest.fixture
+def store():
+    return placestore.PlaceStore(CATEGORIES, [
+        place(1, 18.00, -76.70, [10], likes=5, age_days=3),
+        place(2, 18.01, -76.70, [20], likes=9, age_days=1),
+        place(3, 18.00, -76.71, [10, 20], likes=1, age_days=2),
+        place(4, 19.00, -76.00, [], likes=0, age_days=0),
+    ])
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def test_bbox_is_newest_first(store):
+    assert ids(store.bbox(17.9, -76.8, 18.1, -76.6)) == [2, 3, 1]
+    assert ids(store.bbox(17.9, -76.8, 18.1, -76.6, limit=2)) == [2, 3]
+
+
+def test_category_filters(store):
+    assert ids(store.bbox(0, -180, 90, 180, any_of=[10])) == [3, 1]
+    assert ids(store.bbox(0, -180, 90, 180, all_of=[10, 20])) == [3]
+    # A category the store doesn't know can't be matched by anything
+    assert ids(store.bbox(0, -180, 90, 180, all_of=[10, 99])) == []
+
+
+def test_nearby_is_nearest_first_within_radius(store):
+    results = store.nearby(18.0, -76.7, 2000)
+    assert ids(results) == [1, 3, 2]
+    assert results[0]["distance_m"] == pytest.approx(0.0)
+    # 0.01 degrees of latitude is about 1112 m
+    assert results[2]["distance_m"] == pytest.approx(1112, rel=0.01)
+
+
+def test_top(store):
+    assert ids(store.top("like_count", limit=2)) == [2, 1]
+    assert ids(store.top("created_at", limit=1)) == [4]
+
+
+def test_records(store):
+    record = store.top("like_count", limit=1)[0]
+    assert record["category_ids"] == [20]
+    assert record["created_at"] == EPOCH - timedelta(days=1)
+    assert record["name"] == "place 2"
+
+
+def test_apply_updates_inserts_and_deletes(store):
+    version = store.version
+    store.apply({1, 2, 5}, [place(1, likes=50), place(5, 18.0, -76.7, [20], likes=7)])
+    assert store.version != version
+    assert sorted(int(place_id) for place_id in store.ids) == [1, 3, 4, 5]
+    assert ids(store.top("like_count", limit=2)) == [1, 5]
+    assert ids(store.bbox(0, -180, 90, 180, any_of=[20])) == [5, 3]
+
+
+def test_best_skips_excluded_rows(store):
+    scores = np.array([1.0, -math.inf, 3.0, 2.0])
+    rows = store.best(scores, 5)
+    assert [int(store.ids[row]) for row in rows] == [3, 4, 1]
+
+
+def test_distances(store):
+    distances = store.distances(18.0, -76.7)
+    assert distances[0] == pytest.approx(0.0)
+    assert distances[1] == pytest.approx(1112, rel=0.01)
+
+
+def test_category_scores(store):
+    assert list(store.category_scores({10: 0.25, 20: 0.5, 99: 1.0})) == [0.25, 0.5, 0.75, 0.0]
+
+
+def test_only_the_first_categories_get_mask_bits():
+    categories = [{"id": i, "name": str(i)} for i in range(placestore.MAX_CATEGORIES + 1)]
+    store = placestore.PlaceStore(categories, [place(1, category_ids=[placestore.MAX_CATEGORIES])])
+    assert int(store.masks[0]) == 0
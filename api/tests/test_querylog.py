@@ -0,0 +1,32 @@
+import querylog
+
+
+def test_literals_become_placeholders():
+    assert querylog.fingerprint("SELECT * FROM places WHERE name = 'x' AND id = 42") == (
+        "SELECT * FROM places WHERE name = ? AND id = ?"
+    )
+
+
+def test_escaped_quotes_stay_inside_one_literal():
+    assert querylog.fingerprint("SELECT 'it''s', 'b'") == "SELECT ?, ?"
+
+
+def test_negative_and_decimal_numbers():
+    assert querylog.fingerprint("SELECT * FROM t WHERE x > -1.5 AND y < 2") == "SELECT * FROM t WHERE x > ? AND y < ?"
+
+
+def test_literal_lists_collapse():
+    assert querylog.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3)") == querylog.fingerprint(
+        "SELECT * FROM t WHERE id IN (4,5)"
+    )
+    assert querylog.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3)") == "SELECT * FROM t WHERE id IN (?+)"
+
+
+def test_bind_parameters_and_identifiers_are_kept():
+    assert querylog.fingerprint("SELECT col1 FROM t2 WHERE a = $1 AND b = $12") == (
+        "SELECT col1 FROM t2 WHERE a = $1 AND b = $12"
+    )
+
+
+def test_whitespace_is_squeezed():
+    assert querylog.fingerprint("\n  SELECT  *\n\tFROM t\n") == "SELECT * FROM t"
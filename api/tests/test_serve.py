@@ -0,0 +1,25 @@
+import pytest
+
+import serve
+
+
+def test_pools_and_dedicated_connections_fit_the_budget(monkeypatch):
+    monkeypatch.setattr(serve, "DB_MAX_CONNECTIONS", 20)
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 64)
+    monkeypatch.setattr(serve.os, "environ", {})
+
+    workers = serve.worker_count()
+    serve.configure_pools(workers)
+
+    pool_size = int(serve.os.environ["DB_POOL_MAX_SIZE"])
+    assert workers == serve.max_workers()
+    assert pool_size >= serve.MIN_POOL_SIZE
+    assert workers * (pool_size + serve.DEDICATED_CONNECTIONS) <= 20
+
+
+def test_explicit_workers_over_budget_fail(monkeypatch):
+    monkeypatch.setattr(serve.os, "environ", {"WORKERS": "16"})
+    monkeypatch.setattr(serve, "DB_MAX_CONNECTIONS", 20)
+
+    with pytest.raises(SystemExit):
+        serve.worker_count()
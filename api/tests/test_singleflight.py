@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+import singleflight
+
+
+def test_concurrent_callers_share_one_load():
+    flights = singleflight.SingleFlight("test")
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", load) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights._calls == {}
+
+
+def test_different_keys_load_separately():
+    flights = singleflight.SingleFlight("test")
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    async def main():
+        return await asyncio.gather(flights.do("a", lambda: load("a")), flights.do("b", lambda: load("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_exception_reaches_every_caller_and_is_not_cached():
+    flights = singleflight.SingleFlight("test")
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("key", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert calls == 1
+        with pytest.raises(ValueError):
+            await flights.do("key", failing)
+        assert calls == 2
+
+    asyncio.run(main())
+
+
+def test_waiter_takes_over_when_leader_is_cancelled():
+    flights = singleflight.SingleFlight("test")
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The waiter ran the load itself instead of inheriting the cancellation
+        assert await waiter == 2
+        assert flights._calls == {}
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_cancel_leader():
+    flights = singleflight.SingleFlight("test")
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert await leader == "done"
+
+    asyncio.run(main())
+
+
+def test_waiter_runs_its_own_load_after_timeout():
+    flights = singleflight.SingleFlight("test", timeout=0.01)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.1 if call == 1 else 0)
+        return call
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        assert await flights.do("key", load) == 2
+        assert await leader == 1
+
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+import struct
+
+import snapshot
+
+
+def decode(body):
+    """Parse a snapshot back into plain Python values, checking alignment."""
+    magic, version, mask_bytes, data_version, n, c, s, blob_length = snapshot.HEADER.unpack_from(body, 0)
+    offset = snapshot.HEADER.size
+    sections = {}
+    for name, typecode, count in [
+        ("category_ids", "i", c), ("category_names", "I", c), ("ids", "i", n), ("lat", "i", n), ("lon", "i", n),
+        ("likes", "I", n), ("dislikes", "I", n), ("favorites", "I", n), ("names", "I", n), ("offsets", "I", s + 1),
+    ]:
+        # Typed-array views need 4-byte aligned sections
+        assert offset % 4 == 0, name
+        sections[name] = list(struct.unpack_from(f"<{count}{typecode}", body, offset))
+        offset += 4 * count
+    masks = body[offset:offset + n * mask_bytes]
+    offset += n * mask_bytes
+    blob = body[offset:]
+    assert len(blob) == blob_length
+    offsets = sections["offsets"]
+    strings = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(s)]
+    return {
+        "magic": magic, "format": version, "mask_bytes": mask_bytes, "data_version": data_version,
+        "masks": masks, "strings": strings, **sections,
+    }
+
+
+CATEGORIES = [{"id": 3, "name": "Food"}, {"id": 7, "name": "Study"}]
+PLACES = [
+    {"id": 1, "name": "Café", "latitude": 18.0051234, "longitude": -76.7498765, "category_ids": [3, 7],
+     "like_count": 5, "dislike_count": 1, "favorite_count": 2},
+    {"id": 2, "name": "Food", "latitude": -0.5, "longitude": 0.25, "category_ids": [7, 99],
+     "like_count": 0, "dislike_count": 0, "favorite_count": 0},
+    {"id": 4, "name": None, "latitude": 0, "longitude": 0, "category_ids": [],
+     "like_count": 1, "dislike_count": 2, "favorite_count": 3},
+]
+
+
+def test_header():
+    body = snapshot.encode(42, CATEGORIES, PLACES)
+    decoded = decode(body)
+    assert snapshot.HEADER.size == 32
+    assert decoded["magic"] == snapshot.MAGIC
+    assert decoded["format"] == snapshot.FORMAT_VERSION
+    assert decoded["data_version"] == 42
+    assert decoded["mask_bytes"] == 1
+
+
+def test_round_trip():
+    decoded = decode(snapshot.encode(1, CATEGORIES, PLACES))
+    strings = decoded["strings"]
+    assert decoded["category_ids"] == [3, 7]
+    assert [strings[index] for index in decoded["category_names"]] == ["Food", "Study"]
+    assert decoded["ids"] == [1, 2, 4]
+    assert decoded["lat"] == [180051234, -5000000, 0]
+    assert decoded["lon"] == [-767498765, 2500000, 0]
+    assert decoded["likes"] == [5, 0, 1]
+    assert decoded["dislikes"] == [1, 0, 2]
+    assert decoded["favorites"] == [2, 0, 3]
+    assert [strings[index] for index in decoded["names"]] == ["Café", "Food", ""]
+
+
+def test_strings_are_interned():
+    decoded = decode(snapshot.encode(1, CATEGORIES, PLACES))
+    # "Food" is both a category and a place name
+    assert decoded["strings"].count("Food") == 1
+    assert decoded["names"][1] == decoded["category_names"][0]
+
+
+def test_category_masks_use_category_order_and_skip_unknown_ids():
+    decoded = decode(snapshot.encode(1, CATEGORIES, PLACES))
+    assert list(decoded["masks"]) == [0b11, 0b10, 0]
+
+
+def test_masks_grow_past_eight_categories():
+    categories = [{"id": i, "name": str(i)} for i in range(10)]
+    places = [{"id": 1, "name": "a", "latitude": 0, "longitude": 0, "category_ids": [0, 9],
+               "like_count": 0, "dislike_count": 0, "favorite_count": 0}]
+    decoded = decode(snapshot.encode(1, categories, places))
+    assert decoded["mask_bytes"] == 2
+    assert list(decoded["masks"]) == [0b1, 0b10]
+
+
+def test_empty_snapshot():
+    decoded = decode(snapshot.encode(0, [], []))
+    assert decoded["ids"] == []
+    assert decoded["mask_bytes"] == 1
+    assert decoded["strings"] == []
+
+
+def test_gzipped_copy():
+    current = snapshot.Snapshot(5, snapshot.encode(5, CATEGORIES, PLACES))
+    assert snapshot.gzip.decompress(current.gzipped) == current.body
+
+
+def test_each_encoding_has_its_own_etag():
+    current = snapshot.Snapshot(5, snapshot.encode(5, CATEGORIES, PLACES))
+    assert current.etag != current.gzipped_etag
+
+
+def test_accepts_gzip():
+    assert snapshot.accepts_gzip("gzip, deflate, br")
+    assert snapshot.accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert snapshot.accepts_gzip("*")
+    assert not snapshot.accepts_gzip("")
+    assert not snapshot.accepts_gzip("identity")
+    assert not snapshot.accepts_gzip("gzip;q=0")
+    assert not snapshot.accepts_gzip("gzip;q=0.000, *")
+    assert not snapshot.accepts_gzip("br, *;q=0")
+
+
+def test_etag_matches():
+    assert snapshot.etag_matches('"a"', '"a"')
+    assert snapshot.etag_matches('"x", W/"a"', '"a"')
+    assert snapshot.etag_matches("*", '"a"')
+    assert not snapshot.etag_matches("", '"a"')
+    assert not snapshot.etag_matches('"a-gz"', '"a"')
@@ -1,12 +1,37 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useMap } from '../../hooks/useMap';
 
-const CommentsSection = ({ placeId, comments = [], isAuthenticated }) => {
+const CommentsSection = ({ placeId, comments = [], commentCount, nextCursor = null, isAuthenticated }) => {
   const navigate = useNavigate();
-  const { addComment } = useMap();
+  const { addComment, fetchComments } = useMap();
   const [newComment, setNewComment] = useState('');
   const [loading, setLoading] = useState(false);
+  // The detail response embeds only the newest page; older ones load on demand
+  const [olderComments, setOlderComments] = useState([]);
+  const [cursor, setCursor] = useState(nextCursor);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  useEffect(() => {
+    setOlderComments([]);
+    setCursor(nextCursor);
+  }, [placeId, nextCursor]);
+
+  const allComments = [...comments, ...olderComments];
+  const total = commentCount ?? allComments.length;
+
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchComments(placeId, cursor);
+      setOlderComments((loaded) => [...loaded, ...page.comments]);
+      setCursor(page.comments.length > 0 ? page.nextCursor : null);
+    } catch (err) {
+      console.error('Failed to load more comments:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   
   const handleAddComment = async (e) => {
     e.preventDefault();
@@ -33,7 +58,7 @@ const CommentsSection = ({ placeId, comments = [], isAuthenticated }) => {
 
   return (
     <div>
-      <h2 className="mb-4 font-semibold text-xl">Comments ({comments.length})</h2>
+      <h2 className="mb-4 font-semibold text-xl">Comments ({total})</h2>
       
       {/* Comment form */}
       {isAuthenticated && (
@@ -58,7 +83,7 @@ const CommentsSection = ({ placeId, comments = [], isAuthenticated }) => {
       )}
       
       {/* Comment list */}
-      {comments.length === 0 ? (
+      {allComments.length === 0 ? (
         <div className="bg-gray-50 p-8 rounded-lg text-center">
           <p className="text-gray-500">No comments yet. Be the first to share your thoughts!</p>
           {!isAuthenticated && (
@@ -72,7 +97,7 @@ const CommentsSection = ({ placeId, comments = [], isAuthenticated }) => {
         </div>
       ) : (
         <div className="space-y-4">
-          {comments.map((comment) => (
+          {allComments.map((comment) => (
             <div key={comment.id} className="bg-gray-50 p-4 rounded-lg">
               <div className="flex justify-between">
                 <p className="font-medium">{comment.user?.username}</p>
@@ -83,6 +108,15 @@ const CommentsSection = ({ placeId, comments = [], isAuthenticated }) => {
               <p className="mt-2 whitespace-pre-line">{comment.content}</p>
             </div>
           ))}
+          {cursor && (
+            <button
+              className="bg-gray-100 hover:bg-gray-200 disabled:opacity-50 px-4 py-2 rounded-lg w-full text-gray-700 transition"
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Loading...' : 'Load more comments'}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -204,6 +204,23 @@ export const MapProvider = ({ children }) => {
     }
   }, []);
 
+  // One page of comments older than the `before` cursor, newest first
+  const fetchComments = useCallback(async (placeId, before, limit = 20) => {
+    try {
+      const response = await api.get(`/api/places/${placeId}/comments/`, {
+        params: { before, limit }
+      });
+      return {
+        comments: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null
+      };
+    } catch (err) {
+      setError('Failed to fetch comments');
+      console.error(err);
+      throw err;
+    }
+  }, []);
+
   const getUserFavorites = useCallback(async () => {
     try {
       const response = await api.get('/api/users/me/favorites');
@@ -247,6 +264,7 @@ export const MapProvider = ({ children }) => {
     likePlace,
     favoritePlace,
     addComment,
+    fetchComments,
     getUserFavorites,
     initializeData,
     fetchNewPlaces,
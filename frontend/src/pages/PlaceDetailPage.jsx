@@ -312,6 +312,8 @@ const PlaceDetailPage = () => {
             <CommentsSection
               placeId={place.id}
               comments={place.comments}
+              commentCount={place.comment_count}
+              nextCursor={place.comments_next_cursor}
               isAuthenticated={isAuthenticated}
             />
           </div>